@@ -1,4 +1,9 @@
+from . import columnar
 from . import dataformat
 from . import diagnostic
+from . import diagnostic_approx
+from . import diagnostic_stream
 from . import lambdafn
+from . import memo
 from . import progress
+from . import sketches
@@ -0,0 +1,225 @@
+"""Columnar on-disk cache of interaction datasets, for fast (memory-mapped) reloading
+
+Streams any file or folder readable by dataformat.datafile_reader / data_folder_reader into normalized
+USER_ID, ITEM_ID, TIMESTAMP, EVENT_VALUE columns stored as numpy arrays: integer codes plus a string
+dictionary for the IDs. Re-loading memory-maps the arrays instead of re-parsing the source (only the ID
+dictionaries are read into memory), and the cache is rebuilt automatically whenever the source files'
+size/mtime fingerprint changes.
+"""
+
+# Python Built-Ins:
+from array import array
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# External Dependencies:
+import numpy as np
+import pandas as pd
+
+# Local Dependencies:
+from . import dataformat
+
+FORMAT_VERSION = 2
+ID_FIELDS = ["USER_ID", "ITEM_ID"]
+
+
+def fingerprint_source(source: str) -> List[Tuple[str, int, int]]:
+    """Cheap (name, size, mtime) fingerprint of a source file, or of the non-hidden files in a folder"""
+    if os.path.isdir(source):
+        paths = [
+            os.path.join(source, filename) for filename in sorted(os.listdir(source))
+            if filename[0] not in (".", "$")
+        ]
+    else:
+        paths = [source]
+    fingerprint = []
+    for path in paths:
+        stat = os.stat(path)
+        fingerprint.append((os.path.basename(path), stat.st_size, stat.st_mtime_ns))
+    return fingerprint
+
+
+def _save_vocab(path_prefix: str, vocab: Dict[str, int]) -> None:
+    """Save a {str: code} dictionary (codes 0..N-1 in insertion order) as utf-8 blob + offsets arrays"""
+    encoded = [s.encode("utf-8") for s in vocab]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    np.save(f"{path_prefix}_offsets.npy", offsets)
+    np.save(f"{path_prefix}_data.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+
+def _load_vocab(path_prefix: str) -> List[str]:
+    offsets = np.load(f"{path_prefix}_offsets.npy")
+    data = np.load(f"{path_prefix}_data.npy").tobytes()
+    return [data[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def _codes_dtype(n_categories: int) -> np.dtype:
+    """The int dtype pandas keeps the codes of a Categorical with n_categories in
+
+    Storing codes in it lets load_columnar wrap the memory-mapped codes as they are, without pandas converting
+    (and so copying) them.
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _categorical_from_codes(codes: np.ndarray, categories: List[str]) -> pd.Categorical:
+    """Categorical over `codes` as they are (e.g. memory-mapped), without validating or copying them"""
+    dtype = pd.CategoricalDtype(pd.Index(categories, dtype=object))
+    try:
+        return pd.Categorical.from_codes(codes, dtype=dtype, validate=False)
+    except TypeError:
+        # pandas < 2.1 (where from_codes always reads every code to validate it):
+        return pd.Categorical(codes, dtype=dtype, fastpath=True)
+
+
+def convert_interactions(records: Iterable[Dict[str, Any]], out_dir: str) -> Dict[str, Any]:
+    """Stream raw interaction records into columnar arrays in `out_dir`
+
+    Fields are normalized as dataformat.INTERACTION_FIELDS (i.e. the get_interaction_* getters). IDs are
+    dictionary-encoded to int codes (-1 for missing, in the dtype pandas uses for that many categories), and
+    records whose timestamp can't be parsed are skipped (and counted).
+
+    Returns
+    -------
+    meta :
+        Summary metadata also saved to out_dir/meta.json (without the source fingerprint)
+    """
+    user_vocab = {}
+    item_vocab = {}
+    user_codes = array("i")
+    item_codes = array("i")
+    timestamps = array("q")
+    values = array("d")
+    n_skipped = 0
+    extract, records = dataformat.detect_extractor(records, dataformat.INTERACTION_FIELDS)
+    for record in records:
+        try:
+            user_id, item_id, timestamp, value = extract(record)
+        except (TypeError, ValueError):
+            # Invalid timestamp or value: Work out which, field by field
+            try:
+                timestamp = dataformat.get_interaction_timestamp(record)
+            except (TypeError, ValueError):
+                n_skipped += 1
+                continue
+            user_id = dataformat.get_interaction_user_id(record)
+            item_id = dataformat.get_interaction_item_id(record)
+            value = np.nan
+        timestamps.append(timestamp)
+        user_codes.append(-1 if user_id is None else user_vocab.setdefault(str(user_id), len(user_vocab)))
+        item_codes.append(-1 if item_id is None else item_vocab.setdefault(str(item_id), len(item_vocab)))
+        values.append(value)
+    vocabs = { "USER_ID": user_vocab, "ITEM_ID": item_vocab }
+    codes = { "USER_ID": user_codes, "ITEM_ID": item_codes }
+
+    os.makedirs(out_dir, exist_ok=True)
+    for field in ID_FIELDS:
+        field_codes = np.frombuffer(codes[field], dtype=np.int32).astype(_codes_dtype(len(vocabs[field])))
+        np.save(os.path.join(out_dir, f"{field}.npy"), field_codes)
+        _save_vocab(os.path.join(out_dir, f"{field}_vocab"), vocabs[field])
+    np.save(os.path.join(out_dir, "TIMESTAMP.npy"), np.frombuffer(timestamps, dtype=np.int64))
+    values = np.frombuffer(values, dtype=np.float64)
+    has_values = bool(len(values)) and not np.isnan(values).all()
+    if has_values:
+        np.save(os.path.join(out_dir, "EVENT_VALUE.npy"), values)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "n_records": len(timestamps),
+        "n_skipped": n_skipped,
+        "has_values": has_values,
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def load_columnar(cache_path: str, mmap: bool=True) -> pd.DataFrame:
+    """Load a converted dataset as a DataFrame ready for diagnostic.analyze
+
+    USER_ID and ITEM_ID are returned as pandas Categoricals directly over the memory-mapped codes when `mmap`
+    (only their categories, the ID dictionaries, are read into memory), as are TIMESTAMP and EVENT_VALUE
+    """
+    mmap_mode = "r" if mmap else None
+    with open(os.path.join(cache_path, "meta.json")) as f:
+        meta = json.load(f)
+    columns = {}
+    for field in ID_FIELDS:
+        columns[field] = _categorical_from_codes(
+            np.load(os.path.join(cache_path, f"{field}.npy"), mmap_mode=mmap_mode),
+            _load_vocab(os.path.join(cache_path, f"{field}_vocab")),
+        )
+    columns["TIMESTAMP"] = np.load(os.path.join(cache_path, "TIMESTAMP.npy"), mmap_mode=mmap_mode)
+    if meta["has_values"]:
+        columns["EVENT_VALUE"] = np.load(os.path.join(cache_path, "EVENT_VALUE.npy"), mmap_mode=mmap_mode)
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_interactions(
+    source: str,
+    cache_dir: Optional[str]=None,
+    refresh: bool=False,
+    mmap: bool=True,
+    **reader_kwargs,
+) -> pd.DataFrame:
+    """Load an interactions file/folder via the columnar cache, (re-)building the cache only when needed
+
+    Parameters
+    ----------
+    source :
+        Path to a data file (for datafile_reader) or folder (for data_folder_reader)
+    cache_dir : Optional
+        Folder to keep caches in (default: a hidden .columnar_cache folder alongside `source`)
+    refresh : Optional
+        Set True to force re-building the cache even if the source fingerprint is unchanged
+    mmap : Optional
+        Set False to read the cached arrays fully into memory instead of memory-mapping them
+    **reader_kwargs :
+        Passed through to datafile_reader / data_folder_reader (e.g. n_workers for folders)
+    """
+    source = os.path.abspath(source.rstrip("/\\"))
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(source), ".columnar_cache")
+    fingerprint = fingerprint_source(source)
+    cache_path = os.path.join(
+        cache_dir,
+        os.path.basename(source) + "-" + hashlib.sha1(source.encode("utf-8")).hexdigest()[:8],
+    )
+
+    try:
+        with open(os.path.join(cache_path, "meta.json")) as f:
+            meta = json.load(f)
+        is_fresh = meta["version"] == FORMAT_VERSION and meta.get("fingerprint") == json.loads(
+            json.dumps(fingerprint)
+        )
+    except (OSError, ValueError, KeyError):
+        is_fresh = False
+
+    if refresh or not is_fresh:
+        print(f"Building columnar cache for {source}")
+        if os.path.isdir(source):
+            records = dataformat.data_folder_reader(source, **reader_kwargs)
+        else:
+            records = dataformat.datafile_reader(source, **reader_kwargs)
+        # Build in a temporary folder and swap in, so an interrupted build never looks valid:
+        tmp_path = cache_path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        meta = convert_interactions(records, tmp_path)
+        meta["fingerprint"] = fingerprint
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        shutil.rmtree(cache_path, ignore_errors=True)
+        os.replace(tmp_path, cache_path)
+        if meta["n_skipped"]:
+            print(f"Skipped {meta['n_skipped']} records with missing/invalid timestamps")
+    else:
+        print(f"Loading columnar cache for {source} from {cache_path}")
+
+    return load_columnar(cache_path, mmap=mmap)
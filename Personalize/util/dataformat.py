@@ -4,18 +4,74 @@ Includes getter functions for fetching standard properties from raw objects e.g.
 """
 
 # Python Built-Ins:
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import csv
 import gzip
+from itertools import chain, islice
 import io
 import json
+import multiprocessing
 import os
+import pickle
+import queue
 import re
-from typing import Any, BinaryIO, Dict, Generator, List, Set, Tuple, Union
+import tempfile
+import traceback
+from typing import (
+    Any, BinaryIO, Callable, Dict, Generator, Iterable, Iterator, List, Optional, Set, Tuple, Union
+)
 import zlib
 
+# Optional External Dependencies:
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Local Dependencies:
 from .nullcontext import nullcontext
 
+
+# orjson rejects integers over 64 bits, or (some versions) parses them as floats, in which case blocks of lines with
+# a run of 20+ digits are left to json.loads. Such runs are found quickly as runs of zeros once all digits are
+# mapped to zero:
+_digits_to_zero = bytes.maketrans(b"123456789", b"000000000")
+
+
+def _has_long_digits(data: Union[bytes, str]) -> bool:
+    """Whether data has a run of 20 or more (ASCII) digits"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    # (such a run spans 4 consecutive bytes of every 5th, so check those first, in a fraction of the time)
+    if b"0000" not in data[::5].translate(_digits_to_zero):
+        return False
+    return b"0" * 20 in data.translate(_digits_to_zero)
+
+
+# (whether the installed orjson parses integers over 64 bits, inexactly, rather than rejecting them)
+_orjson_floats_big_ints = False
+if orjson is not None:
+    try:
+        _orjson_floats_big_ints = isinstance(orjson.loads(b"18446744073709551616"), float)
+    except orjson.JSONDecodeError:
+        pass
+
+
+def _orjson_loads(s: Union[bytes, str]) -> Any:
+    """orjson.loads, deferring to json.loads where they differ (e.g. on NaN, or integers over 64 bits)"""
+    if _orjson_floats_big_ints and _has_long_digits(s):
+        return json.loads(s)
+    try:
+        return orjson.loads(s)
+    except orjson.JSONDecodeError:
+        return json.loads(s)
+
+
+# Default JSON decoder for bulk parsing: orjson, if present, parses typical review records about 2.5x faster than the
+# standard library
+fast_json_loads = _orjson_loads if orjson is not None else json.loads
+
 # TODO: Correct typing annotation for False literal is typing.Literal[False] as of Py3.8
 def infer_validate_filetype(
     filename: str,
@@ -47,30 +103,158 @@ def infer_validate_filetype(
     return ext, compression
     
 
+def _decode_json_lines(
+    block: bytes,
+    encoding: str,
+    json_loads: Callable[[Union[bytes, str]], Any],
+) -> List[Any]:
+    """Parse a block of (bytes) JSON lines, one record per non-blank line"""
+    if encoding.lower().replace("-", "") != "utf8":
+        block = block.decode(encoding).encode("utf-8")
+    lines = block.split(b"\n")
+    if json_loads is _orjson_loads and not (_orjson_floats_big_ints and _has_long_digits(block)):
+        # Check the whole block for long numbers at once, and call orjson directly:
+        try:
+            return [orjson.loads(line) for line in lines]
+        except orjson.JSONDecodeError:
+            pass  # (e.g. a blank line, or NaN: parse line by line)
+    return [json_loads(line) for line in lines if line.strip()]
+
+
 # TODO: Change consumers of this function to use datafile_reader instead?
-def json_gz_reader(file: Union[BinaryIO, str], encoding: str="utf-8") -> Generator[Any, None, None]:
+def json_gz_reader(
+    file: Union[BinaryIO, str],
+    encoding: str="utf-8",
+    json_loads: Optional[Callable[[Union[bytes, str]], Any]]=None,
+    read_size: int=1024 * 1024,
+) -> Generator[Any, None, None]:
     """Generate (stream) parsed objects from a gzipped JSON lines file
-    Based on https://stackoverflow.com/a/12572031
+
+    Decompressed data is accumulated and split on newlines as bytes (so long lines spanning many chunks
+    aren't repeatedly re-copied), and the complete lines in each chunk are parsed line by line.
+
+    Parameters
+    ----------
+    file :
+        A file path string OR an open file-like object in BINARY MODE (e.g. an S3 StreamingBody)
+    encoding :
+        If different from UTF-8
+    json_loads :
+        JSON decoder accepting bytes or str (defaults to orjson, with json.loads semantics, if installed)
+    read_size :
+        Number of compressed bytes to read at a time
     """
-    nchunks = 0
+    if json_loads is None:
+        json_loads = fast_json_loads
     ctx = open(file, "rb") if isinstance(file, str) else nullcontext(file)
     with ctx as f:
         dec = zlib.decompressobj(wbits=32 + zlib.MAX_WBITS)  # offset 32 to accept headers
-        pending = ""
-        for chunk in f:
-            nchunks += 1
+        pending = bytearray()
+        while True:
+            chunk = f.read(read_size)
+            if not chunk:
+                break
             raw = dec.decompress(chunk)
-            if raw:
-                lines = (pending + raw.decode(encoding)).split("\n")
-                # Last fragment isn't yet complete - send it back:
-                pending = lines.pop()
-                # Output the others:
-                for line in lines:
-                    yield json.loads(line)
+            # Concatenated gzip members (e.g. from parallel compressors) each need a new decompressor:
+            while dec.eof and dec.unused_data:
+                unused = dec.unused_data
+                dec = zlib.decompressobj(wbits=32 + zlib.MAX_WBITS)
+                raw += dec.decompress(unused)
+            if not raw:
+                continue
+            end = raw.rfind(b"\n")
+            if end < 0:
+                # No complete line yet: just accumulate
+                pending += raw
+                continue
+            pending += raw[:end]
+            block = pending
+            # Last fragment isn't yet complete - keep it for the next chunk:
+            pending = bytearray(raw[end + 1:])
+            yield from _decode_json_lines(block, encoding, json_loads)
 
         # Stream finished, check remaining text:
+        pending += dec.flush()
         if pending:
-            yield json.loads(pending)
+            yield from _decode_json_lines(pending, encoding, json_loads)
+
+
+def _gzip_member(data: bytes, level: int) -> bytes:
+    """Compress `data` as one complete gzip member (zlib releases the GIL, so this runs well in threads)"""
+    cmp = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # offset 16 to include header
+    return cmp.compress(data) + cmp.flush()
+
+
+class ParallelGzipWriter:
+    """Binary file-like writer compressing blocks in parallel to a multi-member gzip stream (like pigz)
+
+    Written data is buffered into blocks of `block_size` bytes, each compressed to an independent gzip
+    member on a thread pool. Members are written out in order, so the output is a valid gzip file which
+    decompresses to exactly the written data (e.g. with gzip, or json_gz_reader). Compression ratio is a
+    little lower than single-stream, since each block starts with an empty dictionary.
+
+    Parameters
+    ----------
+    file :
+        A file path string OR an open file in BINARY MODE to write the compressed data to
+    n_workers : Optional
+        Number of compression threads (default: CPU count)
+    block_size : Optional
+        Uncompressed bytes per gzip member
+    level : Optional
+        zlib compression level
+    """
+    def __init__(
+        self,
+        file: Union[BinaryIO, str],
+        n_workers: Optional[int]=None,
+        block_size: int=1024 * 1024,
+        level: int=6,
+    ):
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.block_size = block_size
+        self.level = level
+        self._ctx = open(file, "wb") if isinstance(file, str) else nullcontext(file)
+        self._file = self._ctx.__enter__()
+        self._executor = ThreadPoolExecutor(max_workers=self.n_workers)
+        # Bound the in-flight blocks so memory use doesn't grow when the file is slower than the producer:
+        self._pending = deque()
+        self._buffer = bytearray()
+        self._n_members = 0
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        if len(self._buffer) >= self.block_size:
+            self._submit()
+        return len(data)
+
+    def _submit(self) -> None:
+        if len(self._pending) >= 2 * self.n_workers:
+            self._file.write(self._pending.popleft().result())
+        self._pending.append(self._executor.submit(_gzip_member, bytes(self._buffer), self.level))
+        self._buffer = bytearray()
+        self._n_members += 1
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            # Always write at least one member, so even empty output is a valid gzip file:
+            if self._buffer or not self._n_members:
+                self._submit()
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown()
+            self._ctx.__exit__(None, None, None)
+            self.closed = True
+
+    def __enter__(self) -> "ParallelGzipWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb) -> None:
+        self.close()
 
 
 # TODO: Correct typing annotation for a string literal is typing.Literal["infer"] as of Py3.8
@@ -139,28 +323,213 @@ def datafile_reader(
                 else:
                     raise ValueError(f"Unrecognised file type '{data_format}'")
 
+def _data_folder_worker(
+    tasks: "multiprocessing.Queue",
+    results: "multiprocessing.Queue",
+    spool_dir: Optional[str],
+    batch_size: int,
+    reader_kwargs: Dict[str, Any],
+) -> None:
+    """Process pool worker for data_folder_reader: Read (file_ix, filepath)s from `tasks` until a None
+
+    Messages are tuples of (kind, file_ix, payload) where kind is "batch" (payload a list of records), "done"
+    (end of file) or "error" (ending the file, payload a formatted traceback). If spool_dir is given, each batch
+    is instead appended (pickled) to the file's spool spool_dir/{file_ix}.pkl, and posted with payload None.
+    """
+    for file_ix, filepath in iter(tasks.get, None):
+        spool_ctx = open(os.path.join(spool_dir, f"{file_ix}.pkl"), "wb") if spool_dir else nullcontext()
+        with spool_ctx as spool:
+            try:
+                records = datafile_reader(filepath, **reader_kwargs)
+                for batch in iter(lambda: list(islice(records, batch_size)), []):
+                    if spool is None:
+                        results.put(("batch", file_ix, batch))
+                    else:
+                        pickle.dump(batch, spool, protocol=pickle.HIGHEST_PROTOCOL)
+                        spool.flush()
+                        results.put(("batch", file_ix, None))
+                results.put(("done", file_ix, None))
+            except Exception:
+                results.put(("error", file_ix, traceback.format_exc()))
+
+
+def _parallel_data_folder_reader(
+    filepaths: List[str],
+    n_workers: int,
+    ordered: bool,
+    batch_size: int,
+    prefetch_batches: int,
+    prefetch_files: int,
+    spool_dir: Optional[str],
+    reader_kwargs: Dict[str, Any],
+) -> Generator[Any, None, None]:
+    # Workers take the next file from a task queue whenever they finish one. Unordered, they post record
+    # batches to one bounded queue, yielded as they arrive. Ordered, they spool each file's batches to disk and
+    # post just a notification, so they can read ahead of the file being yielded without waiting on it or
+    # buffering records in memory: files are assigned at most prefetch_files ahead, and spools deleted once read.
+    n_workers = min(n_workers, len(filepaths))
+    ctx = multiprocessing.get_context()
+    tasks = ctx.Queue()
+    results = ctx.Queue() if ordered else ctx.Queue(maxsize=prefetch_batches * n_workers)
+    remaining_tasks = chain(enumerate(filepaths), [None] * n_workers)
+
+    def assign(n_tasks):
+        for task in islice(remaining_tasks, n_tasks):
+            tasks.put(task)
+
+    with tempfile.TemporaryDirectory(dir=spool_dir) if ordered else nullcontext() as spool:
+        workers = [
+            ctx.Process(
+                target=_data_folder_worker,
+                args=(tasks, results, spool, batch_size, reader_kwargs),
+                daemon=True,
+            )
+            for _ in range(n_workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        def get_message():
+            while True:
+                try:
+                    return results.get(timeout=1)
+                except queue.Empty:
+                    # (a worker killed e.g. for running out of memory can't report an error)
+                    for worker in workers:
+                        if worker.exitcode not in (None, 0):
+                            raise RuntimeError(f"Worker process exited unexpectedly with code {worker.exitcode}")
+
+        def worker_error(file_ix, payload):
+            return RuntimeError(f"Error reading {filepaths[file_ix]} in worker process:\n{payload}")
+
+        try:
+            if ordered:
+                n_spooled = [0] * len(filepaths)
+                is_done = [False] * len(filepaths)
+                errors = {}
+
+                def receive():
+                    kind, file_ix, payload = get_message()
+                    if kind == "batch":
+                        n_spooled[file_ix] += 1
+                    else:
+                        is_done[file_ix] = True
+                        if kind == "error":
+                            errors[file_ix] = payload
+
+                assign(prefetch_files)
+                for file_ix, filepath in enumerate(filepaths):
+                    print(f"Loading {filepath}")
+                    # (the spool exists once the worker posts anything for the file)
+                    while not (n_spooled[file_ix] or is_done[file_ix]):
+                        receive()
+                    spool_path = os.path.join(spool, f"{file_ix}.pkl")
+                    with open(spool_path, "rb") as f:
+                        while n_spooled[file_ix] or not is_done[file_ix]:
+                            if n_spooled[file_ix]:
+                                n_spooled[file_ix] -= 1
+                                yield from pickle.load(f)
+                            else:
+                                receive()
+                    # (failing as sequential reading would, after the records read before the error)
+                    if file_ix in errors:
+                        raise worker_error(file_ix, errors[file_ix])
+                    os.remove(spool_path)
+                    assign(1)
+            else:
+                assign(len(filepaths) + n_workers)
+                n_done = 0
+                started = set()
+                while n_done < len(filepaths):
+                    kind, file_ix, payload = get_message()
+                    if kind == "error":
+                        raise worker_error(file_ix, payload)
+                    if file_ix not in started:
+                        started.add(file_ix)
+                        print(f"Loading {filepaths[file_ix]}")
+                    if kind == "done":
+                        n_done += 1
+                    else:
+                        yield from payload
+            # (any tasks left are the workers' stop signals)
+            assign(n_workers)
+            for worker in workers:
+                worker.join()
+        finally:
+            # (e.g. if the consumer stopped early or a worker failed)
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+
+
 def data_folder_reader(
     folder: str,
     compression: Union[bool, str]="infer",
     data_format: str="infer",
     encoding: str="utf-8",
     csv_dialect: str="excel",
+    n_workers: Optional[int]=None,
+    ordered: bool=True,
+    batch_size: int=5000,
+    prefetch_batches: int=4,
+    prefetch_files: Optional[int]=None,
+    spool_dir: Optional[str]=None,
 ) -> Generator[Any, None, None]:
-    """Generate records sequentially from files in `folder` (non-recursing) via datafile_reader"""
-    contents = []
-    for filename in os.listdir(folder):
+    """Generate records from files in `folder` (non-recursing, in filename order) via datafile_reader
+
+    Files are read sequentially by default. With `n_workers` > 1, files are decompressed and parsed in
+    parallel worker processes, and records passed back in batches to amortize inter-process (pickling)
+    overhead.
+
+    Parameters
+    ----------
+    folder :
+        Local folder to read all (non-hidden) files from
+    compression, data_format, encoding, csv_dialect :
+        As per datafile_reader
+    n_workers : Optional
+        Number of worker processes to read files with (None or 1 for sequential reading)
+    ordered : Optional
+        If True (default), yield records in the same order as sequential reading. If False, yield batches
+        from whichever file they're ready first
+    batch_size : Optional
+        Number of records per batch transferred from worker processes
+    prefetch_batches : Optional
+        Unordered: Maximum number of batches buffered per worker, bounding memory use when the consumer is slower
+    prefetch_files : Optional
+        Ordered: Maximum number of files read ahead (default 2 * n_workers). Workers spool the records of files
+        ahead of the one being yielded to disk, so this bounds the spool's size rather than memory use
+    spool_dir : Optional
+        Ordered: Folder to create the (temporary) spool in, if not the default temporary folder
+    """
+    filepaths = [
+        os.path.join(folder, filename) for filename in sorted(os.listdir(folder))
         # Ignore hidden files:
-        if filename[0] in (".", "$"):
-            continue
-        filepath = os.path.join(folder, filename)
+        if filename[0] not in (".", "$")
+    ]
+    reader_kwargs = {
+        "compression": compression,
+        "data_format": data_format,
+        "encoding": encoding,
+        "csv_dialect": csv_dialect,
+    }
+
+    if n_workers is not None and n_workers > 1 and len(filepaths) > 1:
+        yield from _parallel_data_folder_reader(
+            filepaths,
+            n_workers=n_workers,
+            ordered=ordered,
+            batch_size=batch_size,
+            prefetch_batches=prefetch_batches,
+            prefetch_files=prefetch_files or 2 * n_workers,
+            spool_dir=spool_dir,
+            reader_kwargs=reader_kwargs,
+        )
+        return
+
+    for filepath in filepaths:
         print(f"Loading {filepath}")
-        for record in datafile_reader(
-            filepath,
-            compression=compression,
-            data_format=data_format,
-            encoding=encoding,
-            csv_dialect=csv_dialect,
-        ):
+        for record in datafile_reader(filepath, **reader_kwargs):
             yield record
 
 
@@ -187,7 +556,9 @@ def get_item_id(item: Dict[str, Any]) -> Union[str, None]:
 
 thumbnail_url_exp = re.compile(r"^(.*images-\w+\.ssl-images-amazon.com\/.*\.)(?:_.*_.)(jpg|png)$")
 def get_item_imgurl(item: Dict[str, Any]) -> Union[str, None]:
-    candidate = item.get("imUrl", item.get("IMGURL", item.get("image", item.get("img_url"))))
+    return normalize_imgurl(item.get("imUrl", item.get("IMGURL", item.get("image", item.get("img_url")))))
+
+def normalize_imgurl(candidate: Any) -> Union[str, None]:
     if candidate is None:
         return None
 
@@ -205,7 +576,97 @@ def get_item_imgurl(item: Dict[str, Any]) -> Union[str, None]:
     return candidate
 
 def get_item_title(item: Dict[str, Any]) -> str:
-    return item.get("title", "Unknown")[:280]
+    return normalize_title(item.get("title", "Unknown"))
+
+def normalize_title(title: str) -> str:
+    return title[:280]
 
 def get_user_id(user: Dict[str, Any]) -> str:
     return user.get("id", user.get("ID", user.get("user_id", user.get("USER_ID"))))
+
+
+# Standard fields as {name: (candidate keys as tried by getter, getter, conversion of the raw value or None)}
+INTERACTION_FIELDS = {
+    "USER_ID": (("reviewerID", "user_id", "reviewerId", "USER_ID"), get_interaction_user_id, None),
+    "ITEM_ID": (("asin", "item_id", "ASIN", "ITEM_ID"), get_interaction_item_id, None),
+    "TIMESTAMP": (("unixReviewTime", "TIMESTAMP", "timestamp"), get_interaction_timestamp, int),
+    "EVENT_VALUE": (
+        ("overall", "EVENT_VALUE", "rating", "score", "price"), get_interaction_value, float
+    ),
+}
+ITEM_FIELDS = {
+    "ITEM_ID": (("id", "ID", "asin", "item_id", "ASIN", "ITEM_ID"), get_item_id, None),
+    "TITLE": (("title",), get_item_title, normalize_title),
+    "IMGURL": (("imUrl", "IMGURL", "image", "img_url"), get_item_imgurl, normalize_imgurl),
+}
+
+def compile_extractor(
+    fields: Dict[str, Tuple[Tuple[str, ...], Callable, Optional[Callable]]],
+    sample: List[Dict[str, Any]],
+) -> Callable[[Dict[str, Any]], Tuple]:
+    """Compile a function extracting a tuple of `fields` values from records with the same schema as `sample`
+
+    The getter functions evaluate a whole chain of dict.get() calls (every fallback default) for each field
+    of each record. Instead, this picks for each field the key present in all `sample` records and generates
+    a function subscripting those keys directly. Fields with no consistent key in the sample use their
+    getter as usual, as does every field of any record missing a detected key. Results match the getters
+    unless later records add a higher-priority candidate key alongside the detected one.
+
+    Parameters
+    ----------
+    fields :
+        Fields to extract e.g. INTERACTION_FIELDS, ITEM_FIELDS
+    sample :
+        Representative records (e.g. the first few hundred of the stream) to detect the schema from
+    """
+    namespace = {}
+    exprs = []
+    n_detected = 0
+    for ix, (keys, getter, convert) in enumerate(fields.values()):
+        found = set(next((key for key in keys if key in record), None) for record in sample)
+        key = found.pop() if len(found) == 1 else None
+        if key is None:
+            namespace[f"getter_{ix}"] = getter
+            exprs.append(f"getter_{ix}(record)")
+        elif convert is None:
+            exprs.append(f"record[{key!r}]")
+            n_detected += 1
+        else:
+            namespace[f"convert_{ix}"] = convert
+            exprs.append(f"convert_{ix}(record[{key!r}])")
+            n_detected += 1
+
+    getters = [getter for _, getter, _ in fields.values()]
+    def extract_generic(record):
+        return tuple([getter(record) for getter in getters])
+
+    if not n_detected:
+        return extract_generic
+    namespace["extract_generic"] = extract_generic
+    exec(
+        "def extract(record):\n"
+        "    try:\n"
+        f"        return ({', '.join(exprs)},)\n"
+        "    except KeyError:\n"
+        "        return extract_generic(record)\n",
+        namespace,
+    )
+    return namespace["extract"]
+
+def detect_extractor(
+    records: Iterable[Dict[str, Any]],
+    fields: Dict[str, Tuple[Tuple[str, ...], Callable, Optional[Callable]]]=INTERACTION_FIELDS,
+    n_detect: int=1000,
+) -> Tuple[Callable[[Dict[str, Any]], Tuple], Iterator[Dict[str, Any]]]:
+    """Compile an extractor for `fields` from the first `n_detect` records of a stream
+
+    Returns
+    -------
+    extract :
+        Function mapping a record to a tuple of its `fields` values (see compile_extractor)
+    records :
+        Iterator over the full stream, *including* the records consumed for detection
+    """
+    records = iter(records)
+    sample = list(islice(records, n_detect))
+    return compile_extractor(fields, sample), chain(sample, records)
@@ -1,8 +1,12 @@
 """Diagnostic/exploratory utilities for Personalize recommender datasets"""
 
 # Python Built-Ins:
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import io
+import multiprocessing
+from multiprocessing import shared_memory
 import time
-import traceback
 import warnings
 
 # External Dependencies:
@@ -11,6 +15,8 @@ import pylab as pl
 import numpy as np
 import scipy.sparse as ss
 
+# Local Dependencies:
+from . import memo
 
 INTERACTIONS_REQUIRED_FIELDS = ["USER_ID", "ITEM_ID", "TIMESTAMP"]
 # general
@@ -39,13 +45,22 @@ RETRAIN_FREQUENCY = ['1y','1q','1m','5d','1d','6h']
 TEMPORAL_FREQUENCY = ['5d', '1d', '6h']
 TEMPORAL_LOSS_METHODS = ['total variation', 'out-sample items']
 TEMPORAL_PLOT_LIMIT = 50
+ROLLING_CHUNK_NNZ = 2**24 # max rolling history sum entries computed at once
 
 
-def plot_loglog(val, name='', show=True):
+@memo.memoize
+def fit_loglog(val):
+    """ (slope, intercept, rmse) of the log10 value vs log10 rank line fitted by plot_loglog """
     x = 1+np.arange(len(val))
     slope, intercept = np.polyfit(np.log10(x)[val>0], np.log10(val[val>0]), deg=1)
     full_ret = np.polyfit(np.log10(x)[val>0], np.log10(val[val>0]), deg=1, full=True)
     rmse = np.mean(full_ret[0]**2)**0.5
+    return (slope, intercept, rmse)
+
+
+def plot_loglog(val, name='', show=True):
+    x = 1+np.arange(len(val))
+    slope, intercept, rmse = fit_loglog(np.asarray(val))
     fitted = 10**(intercept + slope*np.log10(x))
     pl.loglog(x, val)
     _axis = pl.axis()
@@ -60,12 +75,84 @@ def plot_loglog(val, name='', show=True):
     return (slope, intercept, rmse)
 
 
+def factorize_ids(sr, categories=None):
+    """ sr.astype(str) as a Categorical, converting only the unique values rather than every row
+
+    categories: a shared vocabulary to code against (values outside it get code -1), or by default the
+    distinct values in order of appearance
+    """
+    if isinstance(sr.dtype, pd.CategoricalDtype) and sr.cat.categories.inferred_type in ('string', 'empty'):
+        if categories is None or sr.cat.categories.equals(categories):
+            return sr.values
+    try:
+        codes, uniques = pd.factorize(sr)
+    except TypeError:
+        # unhashable values (e.g. lists) are only comparable by their str:
+        codes, uniques = pd.factorize(sr.astype(str))
+    labels = pd.Index(uniques, dtype=object).astype(str)
+    if (codes < 0).any():
+        # astype(str) keeps each missing value as its own label e.g. 'nan', 'None':
+        null_codes, null_labels = pd.factorize(np.asarray(sr)[codes < 0].astype(str))
+        codes[codes < 0] = null_codes + len(labels)
+        labels = labels.append(pd.Index(null_labels, dtype=object))
+    # distinct values with the same str (e.g. 1 and '1') share a label:
+    label_codes, labels = pd.factorize(labels)
+    if categories is None:
+        categories = pd.Index(labels, dtype=object)
+    else:
+        label_codes = categories.get_indexer(labels)[label_codes]
+    return pd.Categorical.from_codes(label_codes[codes], categories=categories)
+
+
+def _code_isin(codes, other_codes, n):
+    """ mask of codes (-1 for missing) found in other_codes, both coded into the same n categories """
+    found = np.zeros(n + 1, dtype=bool)
+    found[other_codes] = True
+    found[-1] = False # code -1 is never found
+    return found[codes]
+
+
+def _combined_key(*codes):
+    """ int64 key per row, distinct for each distinct row of the (non-negative) integer code arrays """
+    key = np.zeros(len(codes[0]), dtype=np.int64)
+    n_keys = 1
+    for c in codes:
+        span = int(c.max()) + 1 if len(c) else 1
+        if n_keys * span >= 2**63:
+            # re-number the combinations so far densely, so the key can't overflow:
+            key, uniques = pd.factorize(key)
+            n_keys = len(uniques)
+        key = key * span + c
+        n_keys *= span
+    return key
+
+
+def _category_counts(labels, counts):
+    """ category sizes, as describe_categorical, from the counts of (possibly '|'-separated) labels """
+    cats_freq = pd.Series(counts, index=pd.Index(labels, dtype=object))
+    cats_freq = cats_freq[cats_freq > 0]
+    if cats_freq.index.str.contains('|', regex=False).any():
+        # each label's count, for each of its parts:
+        parts = pd.Series(cats_freq.index).str.split('|').explode()
+        cats_freq = pd.Series(cats_freq.values[parts.index], index=parts.values)
+    return cats_freq.groupby(level=0).sum().sort_values(ascending=False)
+
+
+def compute_category_counts(sr):
+    """ sizes of the '|'-separated categories in sr, splitting each distinct value once """
+    ids = factorize_ids(sr)
+    counts = np.bincount(ids.codes[ids.codes >= 0], minlength=len(ids.categories))
+    return _category_counts(ids.categories.astype(str), counts)
+
+
 def describe_categorical(sr, name=''):
+    return describe_category_counts(compute_category_counts(sr), name)
+
+
+def describe_category_counts(cats_freq, name='', head=None):
+    """ cats_freq: category sizes sorted descending, head: its top categories if cats_freq is unlabeled """
     print("\n=== {} top {} categories ===".format(name, CATS_FREQ_HEAD))
-    parts = sr.astype(str).apply(lambda x: x.split('|'))
-    cats = pd.Series(np.hstack(parts.values))
-    cats_freq = cats.groupby(cats).size().sort_values(ascending=False)
-    print(cats_freq.head(CATS_FREQ_HEAD))
+    print((cats_freq if head is None else head).head(CATS_FREQ_HEAD))
 
     if len(cats_freq) <= LOGLOG_MIN_CATS:
         return None
@@ -88,124 +175,224 @@ def describe_categorical(sr, name=''):
     return (slope, intercept, rmse)
 
 
+@memo.memoize
+def compute_dataframe_description(df):
+    """ (df.describe table, {column: compute_category_counts} for its str/categorical columns) """
+    cats_freqs = {}
+    for cn, dtype in df.dtypes.iteritems():
+        if dtype == object or isinstance(dtype, pd.CategoricalDtype):
+            cats_freqs[cn] = compute_category_counts(df[cn])
+    return df.describe(include="all"), cats_freqs
+
+
 def describe_dataframe(df, name=''):
+    description, cats_freqs = compute_dataframe_description(df)
     print("\n=== Describe {} ===\n".format(name))
-    print(df.describe(include="all"))
+    print(description)
 
     summary = {}
-    for cn, dtype in df.dtypes.iteritems():
-        if dtype == object:
-            summary_cn = describe_categorical(df[cn], cn)
-            if summary_cn is not None:
-                summary[cn] = summary_cn
+    for cn, cats_freq in cats_freqs.items():
+        summary_cn = describe_category_counts(cats_freq, cn)
+        if summary_cn is not None:
+            summary[cn] = summary_cn
     return summary
 
 
-def _normalize_distribution(X, jitter=1e-20):
+def _normalize_distribution(X, jitter=1e-20, inplace=False):
+    """ scale CSR rows to sum to 1; inplace=True overwrites (and returns) X if it is float """
     sums = np.ravel(X.sum(axis=1))
-    rows = np.split(X.data, X.indptr[1:-1])
-    X_data = np.hstack([
-        x/(s+jitter) for s,x in
-        zip(sums, rows)
-    ])
+    # each row's sum, repeated over its stored entries:
+    row_sums = np.repeat(sums + jitter, np.diff(X.indptr))
+    if inplace and np.issubdtype(X.data.dtype, np.floating):
+        np.divide(X.data, row_sums, out=X.data)
+        return X
     return ss.csr_matrix(
-        (X_data, X.indices, X.indptr),
+        (X.data / row_sums, X.indices, X.indptr),
         shape=X.shape)
 
 
-def compute_bootstrap_loss(df, freq, method):
-    tic = time.time()
+def compute_item_counts(df, freq, bs_mask=None, item_codes=None, hist_lens=()):
+    """ time bucket x item count matrices at freq, shared by the bootstrap and temporal losses
 
-    df = df.copy()
-    df['_bs'] = np.random.rand(len(df))<0.5
+    bs_mask (bootstrap split of the rows) is drawn at random if not given, and item_codes (int codes of
+    df['ITEM_ID']) factorized if not given. Returns a dict of the bucket index, df_wgt (events per bucket),
+    Y (all counts), Y_bs (counts of the [False, True] bootstrap splits), their row-normalized p, p_bs,
+    and X: rolling history sums of Y for each of hist_lens
+    """
+    if bs_mask is None:
+        bs_mask = np.random.rand(len(df))<0.5
+    if item_codes is None:
+        item_codes = pd.factorize(df['ITEM_ID'])[0]
+    N = item_codes.max() + 1 if len(item_codes) else 0
 
-    df_cnt = df.groupby(['_bs', pd.Grouper(freq=freq), 'ITEM_ID']).size()
+    keys = pd.DataFrame({'_bs': bs_mask, '_j': item_codes}, index=df.index)
+    df_cnt = keys.groupby(['_bs', pd.Grouper(freq=freq), '_j']).size()
     df_cnt = df_cnt.to_frame('_cnt').reset_index(level=(0,2))
+    return item_counts_from_groups(df_cnt, N, freq, hist_lens)
+
 
+def item_counts_from_groups(df_cnt, N, freq, hist_lens=()):
+    """ compute_item_counts output from a frame of (_bs, _j, _cnt) counts indexed by time bucket """
     index = pd.date_range(
         df_cnt.index.min(),
         df_cnt.index.max(),
         freq=freq)
-    df_wgt = df.groupby(pd.Grouper(freq=freq)).size().reindex(index, fill_value=0)
+    df_wgt = df_cnt.groupby(level=0)['_cnt'].sum().reindex(index, fill_value=0)
 
-    df_cnt['_i'] = np.searchsorted(index, df_cnt.index)
-    df_cnt['_j'] = df_cnt['ITEM_ID'].astype('category').cat.codes
-    N = len(df_cnt['ITEM_ID'].unique())
-
-    Y, X = [ss.coo_matrix((
-        df_cnt[df_cnt['_bs'] == split]['_cnt'],
-        (df_cnt[df_cnt['_bs'] == split]['_i'],
-         df_cnt[df_cnt['_bs'] == split]['_j'])
+    _i = np.searchsorted(index, df_cnt.index)
+    Y_bs = [ss.coo_matrix((
+        df_cnt['_cnt'].values[df_cnt['_bs'].values == split],
+        (_i[df_cnt['_bs'].values == split],
+         df_cnt['_j'].values[df_cnt['_bs'].values == split])
     ), shape=(len(index), N)).tocsr() for split in [0, 1]]
-
-    return compute_distribution_shift(index, df_wgt, Y, X, method, 0, freq, tic)
-
-
-def compute_temporal_loss(df, freq, method, hist_len):
+    Y = Y_bs[0] + Y_bs[1]
+
+    return {
+        'index': index,
+        'df_wgt': df_wgt,
+        'Y': Y,
+        'Y_bs': Y_bs,
+        'p': _normalize_distribution(Y),
+        'p_bs': [_normalize_distribution(y) for y in Y_bs],
+        'X': compute_rolling_history(Y, hist_lens),
+    }
+
+
+def _rolling_history_block(Y, hist_len):
+    """ rolling sums X[t] = Y[t-hist_len:t].sum(axis=0) of a canonical CSC matrix Y, as CSC
+
+    Per item, X is the prefix sum of Y over time minus the prefix sum hist_len buckets earlier: each count
+    v at time r adds +v to the running sum from r+1 and -v from r+hist_len+1, and X is that running sum
+    expanded over the runs of time between consecutive changes
+    """
+    T, N = Y.shape
+    cols = np.repeat(np.arange(N), np.diff(Y.indptr))
+    ev_rows = np.concatenate([Y.indices + 1, Y.indices + hist_len + 1])
+    ev_cols = np.concatenate([cols, cols])
+    ev_vals = np.concatenate([Y.data, -Y.data])
+    valid = ev_rows < T
+    if not valid.any():
+        return ss.csc_matrix((T, N), dtype=Y.dtype)
+    # merge changes at the same (item, time), ordered by item then time:
+    keys, inverse = np.unique(ev_cols[valid].astype(np.int64) * T + ev_rows[valid], return_inverse=True)
+    deltas = np.zeros(len(keys), dtype=Y.dtype)
+    np.add.at(deltas, inverse, ev_vals[valid])
+    ev_cols, ev_rows = np.divmod(keys, T)
+
+    # running sum after each change, restarting at each item:
+    values = np.cumsum(deltas)
+    first = np.r_[True, ev_cols[1:] != ev_cols[:-1]]
+    values -= np.repeat((values - deltas)[first], np.diff(np.r_[np.flatnonzero(first), len(keys)]))
+    # ...which holds until the item's next change (or the end):
+    lengths = np.r_[np.where(first[1:], T, ev_rows[1:]), T] - ev_rows
+    keep = values != 0
+    values, ev_rows, ev_cols, lengths = values[keep], ev_rows[keep], ev_cols[keep], lengths[keep]
+
+    rows = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - ev_rows, lengths)
+    indptr = np.r_[0, np.cumsum(np.bincount(ev_cols, weights=lengths, minlength=N))].astype(np.int64)
+    return ss.csc_matrix((np.repeat(values, lengths), rows, indptr), shape=(T, N))
+
+
+def compute_rolling_history(Y, hist_lens, chunk_nnz=ROLLING_CHUNK_NNZ):
+    """ {hist_len: X} with X[t] = Y[t-hist_len:t].sum(axis=0), for each of hist_lens
+
+    All windows come from one pass over Y (see _rolling_history_block), in blocks of items each producing
+    at most about chunk_nnz entries per hist_len
+    """
+    T, N = Y.shape
+    hist_lens = list(dict.fromkeys(hist_lens))
+    if not hist_lens:
+        return {}
+    Y = ss.csc_matrix(Y)
+    Y.sum_duplicates()
+
+    # split items into blocks by an upper bound of their rolling sum entries:
+    bound = np.cumsum(np.minimum(np.diff(Y.indptr) * max(hist_lens), T))
+    splits = np.searchsorted(bound, np.arange(chunk_nnz, bound[-1] if N else 0, chunk_nnz))
+    blocks = {h: [] for h in hist_lens}
+    for j0, j1 in zip(np.r_[0, splits], np.r_[splits, N]):
+        if j1 > j0:
+            Y_block = Y[:, j0:j1]
+            for h in hist_lens:
+                blocks[h].append(_rolling_history_block(Y_block, h))
+    return {
+        h: (ss.hstack(blocks[h], format='csc') if blocks[h] else ss.csc_matrix((T, N), dtype=Y.dtype)).tocsr()
+        for h in hist_lens
+    }
+
+
+def compute_user_time_stats(user_codes, timestamps):
+    """ (time deltas between each user's consecutive events, each user's time span) as TIMESTAMP Series
+
+    events must already be in time order: one stable sort by user then groups each user's events, in order
+    """
+    order = np.argsort(user_codes, kind='stable')
+    users = np.asarray(user_codes)[order]
+    ts = np.asarray(timestamps)[order]
+    same_user = users[1:] == users[:-1]
+    deltas = np.diff(ts)[same_user].astype(np.float64)
+
+    starts = np.flatnonzero(np.r_[True, ~same_user]) if len(users) else np.array([], dtype=np.int64)
+    spans = np.maximum.reduceat(ts, starts) - np.minimum.reduceat(ts, starts) if len(starts) else ts[:0]
+    return pd.Series(deltas, name='TIMESTAMP'), pd.Series(spans, name='TIMESTAMP')
+
+
+def compute_bootstrap_loss(df, freq, method, counts=None, eps_greedy=None):
+    """ counts: optional compute_item_counts(df, freq) output to reuse, eps_greedy: default EPS_GREEDY """
     tic = time.time()
 
-    df_cnt = df.groupby([pd.Grouper(freq=freq), 'ITEM_ID']).size()
-    df_cnt = df_cnt.to_frame('_cnt').reset_index(level=1)
-
-    index = pd.date_range(
-        df_cnt.index.min(),
-        df_cnt.index.max(),
-        freq=freq)
-    df_wgt = df.groupby(pd.Grouper(freq=freq)).size().reindex(index, fill_value=0)
-
-    df_cnt['_i'] = np.searchsorted(index, df_cnt.index)
-    df_cnt['_j'] = df_cnt['ITEM_ID'].astype('category').cat.codes
-    N = len(df_cnt['ITEM_ID'].unique())
+    if counts is None:
+        counts = compute_item_counts(df, freq)
+    Y, X = counts['Y_bs']
+    p, q = counts['p_bs']
 
-    # sparse data
-    Y = ss.coo_matrix((
-        df_cnt['_cnt'], (df_cnt['_i'], df_cnt['_j'])
-    ), shape=(len(index), N)).tocsr()
+    return compute_distribution_shift(counts['index'], counts['df_wgt'], Y, X, method, 0, freq, tic, p=p, q=q,
+                                      eps_greedy=eps_greedy)
 
-    try: # binary rolling sum
-        B = Y
-        c = 1
-        X = Y*0
-        X.eliminate_zeros()
-        for p,b in enumerate(reversed('{0:b}'.format(hist_len))):
-            if b == '1' and c < len(index):
-                X = X + ss.vstack([ss.csr_matrix((c, N)), B[:-c]])
-                c = c + 2**p
-            if 2**p < len(index):
-                B = B + ss.vstack([ss.csr_matrix((2**p, N)), B[:-2**p]]) # sum 0 .. 2**(p+1)-1
 
-        assert np.allclose(X[-1:].sum(axis=0), Y[-hist_len-1:-1].sum(axis=0))
+def compute_temporal_loss(df, freq, method, hist_len, counts=None, eps_greedy=None):
+    """ counts: optional compute_item_counts(df, freq) output to reuse, eps_greedy: default EPS_GREEDY """
+    tic = time.time()
 
-    except Exception:
-        traceback.print_exc()
-        warnings.warn("falling back to plain rolling sum")
+    if counts is None:
+        counts = compute_item_counts(df, freq)
+    index = counts['index']
+    df_wgt = counts['df_wgt']
+    Y = counts['Y']
 
-        rolling = 0
-        for t in range(hist_len):
-            rolling = rolling + ss.eye(len(index), k=-t-1)
-        X = rolling .dot( Y )
+    if hist_len in counts.get('X', {}):
+        X = counts['X'][hist_len]
+    else:
+        X = compute_rolling_history(Y, [hist_len])[hist_len]
 
-    return compute_distribution_shift(index, df_wgt, Y, X, method, hist_len, freq, tic)
+    return compute_distribution_shift(index, df_wgt, Y, X, method, hist_len, freq, tic, p=counts['p'],
+                                      eps_greedy=eps_greedy)
 
 
-def compute_distribution_shift(index, df_wgt, Y, X, method, hist_len, freq=None, tic=0):
-    """ Y:target (unobserved), X:data (observed) """
+def compute_distribution_shift(index, df_wgt, Y, X, method, hist_len, freq=None, tic=0, p=None, q=None,
+                               eps_greedy=None):
+    """ Y:target (unobserved), X:data (observed), p/q: their already-normalized distributions if known,
+    eps_greedy: exploration rate smoothing the kl/ce losses (default EPS_GREEDY) """
 
+    if eps_greedy is None:
+        eps_greedy = EPS_GREEDY
     N = Y.shape[1]
-    p = _normalize_distribution(Y)
-    q = _normalize_distribution(X)
+    if p is None:
+        p = _normalize_distribution(Y)
+    if q is None:
+        q = _normalize_distribution(X)
 
     if method.lower() in ['kl', 'kl-divergence']:
-        eps_ratio = (1-EPS_GREEDY) / (EPS_GREEDY / N)
+        eps_ratio = (1-eps_greedy) / (eps_greedy / N)
         log_p = (p * eps_ratio).log1p()
         log_q = (q * eps_ratio).log1p()
         temporal_loss = (p .multiply (log_p - log_q)).sum(axis=1)
         loss_fmt = '{:.2f}'
 
     elif method.lower() in ['ce', 'cross-entropy']:
-        eps_ratio = (1-EPS_GREEDY) / (EPS_GREEDY / N)
+        eps_ratio = (1-eps_greedy) / (eps_greedy / N)
         log_q = (q * eps_ratio).log1p()
-        temporal_loss = -((p .multiply (log_q)).sum(axis=1) + np.log(EPS_GREEDY/N))
+        temporal_loss = -((p .multiply (log_q)).sum(axis=1) + np.log(eps_greedy/N))
         loss_fmt = '{:.2f}'
 
     elif method.lower() in ['oov', 'out-sample items']:
@@ -229,35 +416,22 @@ def compute_distribution_shift(index, df_wgt, Y, X, method, hist_len, freq=None,
     return temporal_loss, df_wgt, avg_loss, loss_fmt
 
 
-def analyze_interactions(df):
-    print("\n=== Interactions table, original shape={} ===\n"
-          .format(df.shape))
-    df = df.copy()
-    df['ITEM_ID'] = df['ITEM_ID'].astype(str)
-    df['USER_ID'] = df['USER_ID'].astype(str)
-    df.index = df["TIMESTAMP"].values.astype("datetime64[s]")
-
-
-    na_rate = df[INTERACTIONS_REQUIRED_FIELDS].isnull().any(axis=1).mean()
+def check_missing_rate(na_rate):
     print("missing rate in fields", INTERACTIONS_REQUIRED_FIELDS, na_rate)
     if na_rate > NA_RATE_THRESHOLD:
         warnings.warn("High data missing rate for required fields ({:.1%})!".format(na_rate))
-    df = df.dropna(subset=INTERACTIONS_REQUIRED_FIELDS)
-    print("dropna shape", df.shape)
 
 
-    dup_rate = (df.groupby(INTERACTIONS_REQUIRED_FIELDS).size() - 1.0).sum() / df.shape[0]
+def check_duplication_rate(dup_rate):
     print("duplication rate", dup_rate)
     if dup_rate > DUP_RATE_THRESHOLD:
         warnings.warn("""
         High duplication rate ({:.1%})!
         Only one event can be taken at the same (user,item,timestamp) index.
         """.format(dup_rate))
-    df = df.drop_duplicates(subset=INTERACTIONS_REQUIRED_FIELDS)
-    print("drop_duplicates shape", df.shape)
 
 
-    repeat_rate = (df.groupby(["USER_ID", "ITEM_ID"]).size() - 1.0).sum() / df.shape[0]
+def check_repeat_rate(repeat_rate):
     print("user item repeat rate", repeat_rate)
     if repeat_rate > REPEAT_RATE_THRESHOLD:
         warnings.warn("""
@@ -268,32 +442,119 @@ def analyze_interactions(df):
         (3) use high-order hierarchical models.
         """.format(repeat_rate))
 
-    summary = describe_dataframe(df, 'interactions table')
-
 
+def analyze_activity_patterns(hourly, dayofweek, daily):
+    """ print/plot event counts Series by hour, day of week and date """
     print("\n=== Hourly activity pattern ===")
-    print(df.groupby(df.index.hour).size())
+    print(hourly)
 
     print("\n=== Day of week activity pattern ===")
-    print(df.groupby(df.index.dayofweek).size())
+    print(dayofweek)
 
     plot_patterns = {
-        "date": df.index.date,
-        "hour": df.index.hour,
-        "dayofweek": df.index.dayofweek}
+        "date": daily,
+        "hour": hourly,
+        "dayofweek": dayofweek}
 
     for k,v in plot_patterns.items():
-        pl.plot(df.groupby(v).size(), '.-')
+        pl.plot(v, '.-')
         pl.gcf().autofmt_xdate()
         pl.title("Activity pattern by %s" %k)
         pl.grid()
         pl.show()
 
 
-    print("\n=== Temporal shift analysis ===\n")
-    print("Sorting and removing repeated user-items for temporal shift analysis...")
-    df.sort_index(inplace=True, kind='mergesort')
-    df_dedup = df.drop_duplicates(['USER_ID','ITEM_ID'], keep='last')
+def _temporal_hist_lens(freq):
+    """ history lengths analyze_temporal_shift evaluates at freq (besides the bootstrap) """
+    return [1] + (ROLLING_HISTORY_LEN if freq in TEMPORAL_FREQUENCY else [])
+
+
+def _share_array(arr):
+    """ copy arr into a new SharedMemory block: returns the block and a (name, shape, dtype) spec to attach """
+    block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[...] = arr
+    return block, (block.name, arr.shape, arr.dtype.str)
+
+
+def _attach_array(spec):
+    """ copy of the array shared by _share_array """
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return np.array(np.ndarray(shape, dtype=dtype, buffer=block.buf))
+    finally:
+        block.close()
+
+
+@memo.memoize(ignore=['bs_mask'])
+def compute_temporal_cells(times, bs_mask, item_codes, freq, methods, hist_lens, eps_greedy):
+    """ every loss of methods at freq, as {(method, hist_len): (result, printed text)}
+
+    hist_len 0 is the bootstrap loss, besides each of hist_lens. The settings are arguments (rather than read
+    from the module) so they are part of the memo key. Memoized without bs_mask: a cached bootstrap loss
+    keeps the random split it was first computed with
+    """
+    counts = compute_item_counts(
+        pd.DataFrame(index=pd.DatetimeIndex(times)), freq, bs_mask, item_codes, hist_lens)
+    cells = {}
+    for method in methods:
+        for hist_len in [0] + list(hist_lens):
+            printed = io.StringIO()
+            with redirect_stdout(printed):
+                if hist_len == 0:
+                    result = compute_bootstrap_loss(None, freq, method, counts, eps_greedy)
+                else:
+                    result = compute_temporal_loss(None, freq, method, hist_len, counts, eps_greedy)
+            cells[(method, hist_len)] = (result, printed.getvalue())
+    return cells
+
+
+def _temporal_grid_worker(cell_args, specs, cache=None):
+    """ process pool task: compute_temporal_cells with the parent's settings, memoized in its cache """
+    times, bs_mask, item_codes = [_attach_array(spec) for spec in specs]
+    with memo.using(cache):
+        return compute_temporal_cells(times, bs_mask, item_codes, *cell_args)
+
+
+def compute_temporal_grid(times, bs_mask, item_codes, n_workers=None):
+    """ every analyze_temporal_shift loss, one frequency per task over a process pool (if n_workers > 1)
+
+    times, bs_mask, item_codes: the de-duplicated events' datetime64 times, bootstrap split and item codes,
+    passed to the workers in shared memory. Returns {freq: compute_temporal_cells output}, in the same
+    order whatever order the tasks finish in
+    """
+    freqs = list(dict.fromkeys(RETRAIN_FREQUENCY + TEMPORAL_FREQUENCY))
+    # (the current settings, read here so pool workers use them too)
+    cell_args = [(freq, list(TEMPORAL_LOSS_METHODS), _temporal_hist_lens(freq), EPS_GREEDY) for freq in freqs]
+    if n_workers is None or n_workers <= 1:
+        return {args[0]: compute_temporal_cells(times, bs_mask, item_codes, *args) for args in cell_args}
+    shared = [_share_array(np.asarray(arr)) for arr in (times, bs_mask, item_codes)]
+    try:
+        specs = [spec for _, spec in shared]
+        with ProcessPoolExecutor(n_workers, mp_context=multiprocessing.get_context()) as executor:
+            return dict(zip(freqs, executor.map(
+                _temporal_grid_worker, cell_args, [specs] * len(freqs), [memo.active()] * len(freqs))))
+    finally:
+        for block, _ in shared:
+            block.close()
+            block.unlink()
+
+
+def analyze_temporal_shift(item_counts=None, df_dedup=None, grid=None):
+    """ plot losses over RETRAIN_FREQUENCY and TEMPORAL_FREQUENCY x ROLLING_HISTORY_LEN
+
+    item_counts: {freq: compute_item_counts output} for every frequency (with the rolling history sums), or
+    grid: the already computed losses, as compute_temporal_grid
+    """
+    def loss(freq, method, hist_len):
+        """ compute_bootstrap_loss (hist_len=0) or compute_temporal_loss result, or its grid replay """
+        if grid is not None:
+            result, printed = grid[freq][(method, hist_len)]
+            print(printed, end='')
+            return result
+        if hist_len == 0:
+            return compute_bootstrap_loss(df_dedup, freq, method, item_counts[freq])
+        return compute_temporal_loss(df_dedup, freq, method, hist_len, item_counts[freq])
 
     print("\n=== Temporal shift - retrain frequency ===\n")
 
@@ -301,8 +562,8 @@ def analyze_interactions(df):
         bootstrap_avg = []
         past_fut_avg  = []
         for freq in RETRAIN_FREQUENCY:
-            _, _, _bs_avg, loss_fmt = compute_bootstrap_loss(df_dedup, freq, method)
-            _, _, _ts_avg, loss_fmt = compute_temporal_loss(df_dedup, freq, method, 1)
+            _, _, _bs_avg, loss_fmt = loss(freq, method, 0)
+            _, _, _ts_avg, loss_fmt = loss(freq, method, 1)
             bootstrap_avg.append(_bs_avg)
             past_fut_avg.append(_ts_avg)
         pl.plot(RETRAIN_FREQUENCY, bootstrap_avg, '.--', label='same-period bootstrap')
@@ -319,12 +580,12 @@ def analyze_interactions(df):
 
     for method in TEMPORAL_LOSS_METHODS:
         for freq in TEMPORAL_FREQUENCY:
-            bootstrap_loss, _, avg_loss, loss_fmt = compute_bootstrap_loss(df_dedup, freq, method)
+            bootstrap_loss, _, avg_loss, loss_fmt = loss(freq, method, 0)
             pl.plot(bootstrap_loss.iloc[-TEMPORAL_PLOT_LIMIT:], '.--',
                         label = 'boostrap baseline={}'.format(loss_fmt.format(avg_loss)))
 
             for hist_len in ROLLING_HISTORY_LEN:
-                temporal_loss, df_wgt, avg_loss, loss_fmt = compute_temporal_loss(df_dedup, freq, method, hist_len)
+                temporal_loss, df_wgt, avg_loss, loss_fmt = loss(freq, method, hist_len)
 
                 pl.plot(temporal_loss.iloc[-TEMPORAL_PLOT_LIMIT:], '.-',
                         label = 'hist={} * {}, avg={}'.format(hist_len, freq, loss_fmt.format(avg_loss)))
@@ -340,9 +601,62 @@ def analyze_interactions(df):
             pl.legend(['activity density'], loc='upper right')
             pl.show()
 
+
+def analyze_interactions(df, n_workers=None):
+    """ n_workers: number of processes computing the temporal shift losses, if more than 1 """
+    print("\n=== Interactions table, original shape={} ===\n"
+          .format(df.shape))
+    df = df.copy()
+    df['ITEM_ID'] = factorize_ids(df['ITEM_ID'])
+    df['USER_ID'] = factorize_ids(df['USER_ID'])
+    df.index = df["TIMESTAMP"].values.astype("datetime64[s]")
+
+
+    na_rate = df[INTERACTIONS_REQUIRED_FIELDS].isnull().any(axis=1).mean()
+    check_missing_rate(na_rate)
+    df = df.dropna(subset=INTERACTIONS_REQUIRED_FIELDS)
+    print("dropna shape", df.shape)
+
+
+    # (user, item) and (user, item, timestamp) as int64 keys, instead of grouping the columns:
+    pair_key = _combined_key(df['USER_ID'].cat.codes.values, df['ITEM_ID'].cat.codes.values)
+    event_key = _combined_key(pair_key, pd.factorize(df['TIMESTAMP'])[0])
+    is_dup = pd.Index(event_key).duplicated()
+    dup_rate = is_dup.sum() / df.shape[0]
+    check_duplication_rate(dup_rate)
+    df = df[~is_dup]
+    pair_key = pair_key[~is_dup]
+    print("drop_duplicates shape", df.shape)
+
+
+    repeat_rate = pd.Index(pair_key).duplicated().sum() / df.shape[0]
+    check_repeat_rate(repeat_rate)
+
+    summary = describe_dataframe(df, 'interactions table')
+
+
+    analyze_activity_patterns(
+        df.groupby(df.index.hour).size(),
+        df.groupby(df.index.dayofweek).size(),
+        df.groupby(df.index.date).size())
+
+
+    print("\n=== Temporal shift analysis ===\n")
+    print("Sorting and removing repeated user-items for temporal shift analysis...")
+    order = np.argsort(df.index.values, kind='mergesort')
+    df = df.iloc[order]
+    pair_key = pair_key[order]
+    df_dedup = df[~pd.Index(pair_key).duplicated(keep='last')]
+
+    # one bootstrap split, shared by the count matrices of every frequency:
+    bs_mask = np.random.rand(len(df_dedup))<0.5
+    item_codes = pd.factorize(df_dedup['ITEM_ID'].cat.codes.values)[0]
+    grid = compute_temporal_grid(df_dedup.index.values, bs_mask, item_codes, n_workers)
+    analyze_temporal_shift(grid=grid)
+
     print("\n=== session time delta describe ===")
 
-    user_time_delta = df.groupby('USER_ID')["TIMESTAMP"].transform(pd.Series.diff).dropna()
+    user_time_delta, user_time_span = compute_user_time_stats(df['USER_ID'].cat.codes.values, df["TIMESTAMP"])
     user_time_delta.sort_values(ascending=False, inplace=True)
     print(user_time_delta.describe())
     plot_loglog(user_time_delta, 'session time delta', show=False)
@@ -353,7 +667,6 @@ def analyze_interactions(df):
     pl.show()
 
 
-    user_time_span = df.groupby('USER_ID')["TIMESTAMP"].apply(lambda x:max(x)-min(x))
     user_time_span.sort_values(ascending=False, inplace=True)
     print("=== user time span describe ===")
     print(user_time_span.describe())
@@ -383,17 +696,20 @@ def analyze_interactions(df):
 def analyze_users(df, users):
     print("\n=== Users table, original shape={} ===\n"
           .format(users.shape))
-    users = users.copy()
-    users['USER_ID'] = users['USER_ID'].astype(str)
+    # code the table's IDs against the interactions' vocabulary, to compare codes instead of str sets:
+    df_ids = factorize_ids(df['USER_ID'])
+    df_codes = df_ids.codes
+    meta_codes = factorize_ids(users['USER_ID'], categories=df_ids.categories).codes
+    n_ids = len(df_ids.categories)
     users = users.set_index('USER_ID')
 
-    missing_rate = 1 - df.USER_ID.astype(str).isin(set(users.index.values)).mean()
+    missing_rate = 1 - _code_isin(df_codes, meta_codes, n_ids).mean()
     print("Missing rate of all user meta-data", missing_rate)
     if missing_rate > NA_RATE_THRESHOLD:
         warnings.warn("High missing rate of all user meta-data ({:%})!"
                       .format(missing_rate))
 
-    coldstart_rate = 1 - users.index.isin(set(df.USER_ID.astype(str).values)).mean()
+    coldstart_rate = 1 - _code_isin(meta_codes, df_codes, n_ids).mean()
     print("User coldstart rate", coldstart_rate)
     if coldstart_rate > COLDSTART_RATE_THRESHOLD:
         warnings.warn("High user coldstart rate ({:%})!"
@@ -405,17 +721,20 @@ def analyze_users(df, users):
 def analyze_items(df, items):
     print("\n=== Items table, original shape={} ===\n"
           .format(items.shape))
-    items = items.copy()
-    items['ITEM_ID'] = items['ITEM_ID'].astype(str)
+    # code the table's IDs against the interactions' vocabulary, to compare codes instead of str sets:
+    df_ids = factorize_ids(df['ITEM_ID'])
+    df_codes = df_ids.codes
+    meta_codes = factorize_ids(items['ITEM_ID'], categories=df_ids.categories).codes
+    n_ids = len(df_ids.categories)
     items = items.set_index('ITEM_ID')
 
-    missing_rate = 1 - df.ITEM_ID.astype(str).isin(set(items.index.values)).mean()
+    missing_rate = 1 - _code_isin(df_codes, meta_codes, n_ids).mean()
     print("Missing rate of all item meta-data", missing_rate)
     if missing_rate > NA_RATE_THRESHOLD:
         warnings.warn("High missing rate of all item meta-data ({:%})!"
                       .format(missing_rate))
 
-    coldstart_rate = 1 - items.index.isin(set(df.ITEM_ID.astype(str).values)).mean()
+    coldstart_rate = 1 - _code_isin(meta_codes, df_codes, n_ids).mean()
     print("Item coldstart rate", coldstart_rate)
     if coldstart_rate > NA_RATE_THRESHOLD:
         warnings.warn("High item coldstart rate ({:%})!"
@@ -437,12 +756,24 @@ def analyze_items(df, items):
         print("CREATION_TIMESTAMP not found in items table")
 
 
-def analyze(df, users=None, items=None):
+def analyze(df, users=None, items=None, n_workers=None, cache_dir=None):
+    """ n_workers: number of processes computing the temporal shift losses, if more than 1
+
+    cache_dir: folder to memoize the expensive results in (see memo), so repeat runs on unchanged data only
+    re-render; by default the cache enabled by memo.enable, if any
+    """
+    with memo.using(cache_dir):
+        _analyze(df, users, items, n_workers)
+
+
+def _analyze(df, users, items, n_workers):
     print("########################################")
     print("# DIAGNOSING INTERACTIONS TABLE, SAMPLE:")
     print("########################################")
     print(df.sample(min(len(df), 10)))
-    analyze_interactions(df)
+    # one shared vocabulary (str ID -> int code) per ID field, for every table:
+    df = df.assign(USER_ID=factorize_ids(df['USER_ID']), ITEM_ID=factorize_ids(df['ITEM_ID']))
+    analyze_interactions(df, n_workers)
 
     if users is not None:
         print("########################################")
@@ -0,0 +1,291 @@
+"""Approximate (sampling and sketch based) interactions diagnostics, for interactive use on huge tables
+
+Instead of grouping the whole table as diagnostic.analyze_interactions does, analyze_interactions_approx
+makes a vectorized pass over it (a chunk at a time) to:
+
+- Hash the distinct USER_IDs and ITEM_IDs (see sketches.hash_labels)
+- Estimate the distinct users and items with HyperLogLogs
+- Keep the top USER_ID and ITEM_ID categories in HeavyHitters summaries, in place of describe_categorical
+  (counting every event, including exact duplicates)
+- Count events per user in a CountMinSketch, and check the IDs against the users/items tables if given
+- Spill each event's USER_ID hash (8 bytes per row) to a temporary file
+
+This is the only pass over the ID strings. It then draws a seeded, stratified sample of users, in two passes
+over the spilled hashes (so memory stays bounded by the chunk size, the sketches and the sample): users are
+stratified by their (sketched) number of events, and sampled with probability proportional to it (capped at
+1), so the few heavy users that hold most of the events and most of the variance are the most likely kept.
+Only the sampled users' events are then read from the table. The duplication and repeat rates are computed
+exactly on them, and scaled back up with Horvitz-Thompson ratio estimators, together with 95% confidence
+intervals. The missing metadata and cold-start rates are exact (up to 64-bit hash collisions).
+
+The activity patterns, temporal shift and time delta analyses are not included.
+"""
+
+# Python Built-Ins:
+import tempfile
+from typing import Any, Dict, Optional
+import warnings
+
+# External Dependencies:
+import numpy as np
+import pandas as pd
+
+# Local Dependencies:
+from . import diagnostic
+from . import sketches
+
+DEFAULT_SAMPLE_FRAC = 0.01
+Z_95 = 1.96
+
+
+def _sample_probabilities(stratum_rows: np.ndarray, sample_frac: float) -> np.ndarray:
+    """Per-stratum user inclusion probabilities min(1, c * 2**stratum), with about sample_frac of the rows"""
+    target = sample_frac * stratum_rows.sum()
+    sizes = 2.0 ** np.arange(len(stratum_rows))
+    if target >= stratum_rows.sum():
+        return np.ones(len(stratum_rows))
+    lo, hi = 0.0, 1.0
+    for _ in range(100):
+        c = (lo + hi) / 2
+        if (stratum_rows * np.minimum(1, c * sizes)).sum() < target:
+            lo = c
+        else:
+            hi = c
+    return np.minimum(1, hi * sizes)
+
+
+def _ht_total(y: np.ndarray, prob: np.ndarray):
+    """Horvitz-Thompson (estimate, variance estimate) of a total over users, from the sampled users' y
+
+    The variance is unknown (NaN) if no users were sampled.
+    """
+    if not len(y):
+        return 0.0, np.nan
+    return np.sum(y / prob), np.sum((1 - prob) * y**2 / prob**2)
+
+
+def _ht_ratio(y: np.ndarray, x: np.ndarray, prob: np.ndarray):
+    """(estimate, linearized variance estimate) of the ratio of totals sum(y) / sum(x) over users
+
+    As y and x (e.g. a user's duplicate events and events) grow together, the ratio of their estimated totals
+    varies much less than either total.
+    """
+    y_total, _ = _ht_total(y, prob)
+    x_total, _ = _ht_total(x, prob)
+    if not x_total:
+        return 0.0, np.nan
+    ratio = y_total / x_total
+    _, var = _ht_total(y - ratio * x, prob)
+    return ratio, var / x_total**2
+
+
+def _id_coverage(hashes: np.ndarray, counts: np.ndarray, table_hashes: np.ndarray, table_seen: np.ndarray) -> int:
+    """Count the events of (distinct) `hashes` not in (sorted) table_hashes, and mark the table_seen entries that are
+
+    Every copy of an ID repeated in the table is marked, as analyze_users/analyze_items count cold-start per row.
+    """
+    lo = np.searchsorted(table_hashes, hashes, "left")
+    hi = np.searchsorted(table_hashes, hashes, "right")
+    found = hi > lo
+    # (marking each found ID's run lo:hi, where the number of runs started minus ended is positive)
+    n = len(table_hashes) + 1
+    in_runs = np.cumsum(np.bincount(lo[found], minlength=n) - np.bincount(hi[found], minlength=n))[:-1]
+    table_seen |= in_runs > 0
+    return int(counts[~found].sum())
+
+
+def _factorize_chunk(values: np.ndarray):
+    """(codes, uniques, str labels, label hashes) of a chunk's IDs, with missing IDs as a value of their own"""
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=False)
+    labels = pd.Index(uniques, dtype=object).astype(str)
+    return codes, uniques, labels, sketches.hash_labels(labels)
+
+
+def _top_counts(labels: pd.Index, hashes: np.ndarray, counts: np.ndarray, top: sketches.HeavyHitters) -> pd.Series:
+    """A chunk's category counts for top.update, leaving out the categories it would drop anyway
+
+    Unless some labels are '|'-separated lists of categories, the categories are the labels (by their hash),
+    and after merging, only those `top` already keeps or among the chunk's capacity + 1 largest can be kept:
+    any other's merged count is at most the (unchanged) capacity + 1'th largest. So only those are counted.
+    """
+    if len(labels) > top.capacity + 1 and not any("|" in label for label in labels.values):
+        cat_codes, cat_hashes = pd.factorize(hashes)
+        cat_counts = np.bincount(cat_codes, weights=counts, minlength=len(cat_hashes))
+        keep = np.isin(cat_hashes, sketches.hash_labels(top.counts.index))
+        keep[np.argpartition(-cat_counts, top.capacity)[:top.capacity + 1]] = True
+        labels, counts = labels[keep[cat_codes]], counts[keep[cat_codes]]
+    return diagnostic._category_counts(labels, counts)
+
+
+def _user_strata(hashes: np.ndarray, user_events: sketches.CountMinSketch) -> np.ndarray:
+    """Stratum of each user: the log2 of their sketched number of events (< 2**64, so < 64), rounded down"""
+    return np.floor(np.log2(np.maximum(user_events.estimate(hashes), 1))).astype(np.intp)
+
+
+def analyze_interactions_approx(
+    df: pd.DataFrame,
+    users: Optional[pd.DataFrame]=None,
+    items: Optional[pd.DataFrame]=None,
+    sample_frac: float=DEFAULT_SAMPLE_FRAC,
+    seed: int=0,
+    chunk_size: int=10000000,
+    hll_precision: int=14,
+    top_capacity: int=1000,
+    tmp_dir: Optional[str]=None,
+) -> Dict[str, Any]:
+    """Approximate interactions diagnostics (see module docstring), with error bounds
+
+    Parameters
+    ----------
+    df :
+        Interactions table with USER_ID, ITEM_ID and TIMESTAMP columns, as for diagnostic.analyze
+    users, items : Optional
+        Users/items metadata tables, for the missing metadata and cold-start rates
+    sample_frac : Optional
+        Approximate fraction of the events (of whole, stratified users) to compute the rates from
+    seed : Optional
+        Random seed of the user sample: the same seed samples the same users
+    chunk_size : Optional
+        Number of rows hashed and sketched at a time
+    hll_precision : Optional
+        HyperLogLog precision (2**precision registers, relative error 1.04 / sqrt(2**precision))
+    top_capacity : Optional
+        Number of counters kept for the top categories (errors are <= number of events / top_capacity)
+    tmp_dir : Optional
+        Folder for the spilled USER_ID hashes (default: the system temp folder). The file is deleted when done
+
+    Returns
+    -------
+    stats :
+        Dict of the estimates: each rate as a (value, 95% confidence interval half-width) tuple, n_users /
+        n_items as (estimate, 95% half-width), and top_users / top_items HeavyHitters
+    """
+    id_tables = {"USER_ID": users, "ITEM_ID": items}
+    table_hashes = {}
+    table_seen = {}
+    for field, table in id_tables.items():
+        if table is not None:
+            table_hashes[field] = np.sort(sketches.hash_ids(table[field].values))
+            table_seen[field] = np.zeros(len(table_hashes[field]), dtype=bool)
+    n_missing_meta = {field: 0 for field in table_hashes}
+
+    distinct = {field: sketches.HyperLogLog(hll_precision) for field in id_tables}
+    top = {field: sketches.HeavyHitters(top_capacity) for field in id_tables}
+    user_events = sketches.CountMinSketch(seed=seed)
+    n_rows = len(df)
+    n_valid = 0
+    chunk_starts = range(0, n_rows, chunk_size)
+    chunk_n_valid = []
+    samples = []
+    with tempfile.TemporaryFile(prefix="diagnostic-", dir=tmp_dir) as user_spill:
+        # Pass 1 (the only one over the ID strings): sketch, and spill the valid rows' USER_ID hashes
+        for start in chunk_starts:
+            chunk = df.iloc[start:start + chunk_size]
+            # (IDs are compared by their str, so only the TIMESTAMP can be missing, as analyze_interactions)
+            chunk_valid = chunk["TIMESTAMP"].notnull().values
+            chunk_n_valid.append(np.count_nonzero(chunk_valid))
+            n_valid += chunk_n_valid[-1]
+            for field in id_tables:
+                codes, uniques, labels, hashes = _factorize_chunk(chunk[field].values)
+                if field in table_hashes:
+                    # (over all rows, as analyze_users/analyze_items)
+                    all_counts = np.bincount(codes, minlength=len(uniques))
+                    n_missing_meta[field] += _id_coverage(
+                        hashes, all_counts, table_hashes[field], table_seen[field])
+                valid_codes = codes[chunk_valid]
+                counts = np.bincount(valid_codes, minlength=len(uniques))
+                is_id = ~pd.isnull(uniques)
+                top[field].update(
+                    _top_counts(labels[is_id], hashes[is_id], counts[is_id], top[field]),
+                    total=int(counts[is_id].sum()),
+                )
+                distinct[field].add(hashes[counts > 0])
+                if field == "USER_ID":
+                    user_events.add(hashes, counts)
+                    hashes[valid_codes].tofile(user_spill)
+            del chunk
+
+        # Pass 2: rows per user stratum, by each user's sketched number of events
+        stratum_rows = np.zeros(64)
+        user_spill.seek(0)
+        for n in chunk_n_valid:
+            codes, hashes = pd.factorize(np.fromfile(user_spill, dtype=np.uint64, count=n))
+            user_rows = np.bincount(codes, minlength=len(hashes))
+            stratum_rows += np.bincount(_user_strata(hashes, user_events), weights=user_rows, minlength=64)
+        stratum_prob = _sample_probabilities(stratum_rows, sample_frac)
+
+        # Pass 3: draw the users, and read the ITEM_IDs and TIMESTAMPs of the sampled users' rows only
+        user_spill.seek(0)
+        for start, n in zip(chunk_starts, chunk_n_valid):
+            user_hashes = np.fromfile(user_spill, dtype=np.uint64, count=n)
+            codes, hashes = pd.factorize(user_hashes)
+            prob = stratum_prob[_user_strata(hashes, user_events)]
+            sampled = (sketches.uniform_from_hash(hashes, seed) < prob)[codes]
+            timestamps = df["TIMESTAMP"].values[start:start + chunk_size]
+            rows = start + np.flatnonzero(pd.notnull(timestamps))[sampled]
+            samples.append(pd.DataFrame({
+                "USER_ID": user_hashes[sampled],
+                "ITEM_ID": sketches.hash_ids(df["ITEM_ID"].values[rows]),
+                "TIMESTAMP": df["TIMESTAMP"].values[rows],
+                "_prob": prob[codes[sampled]],
+            }))
+    sample = pd.concat(samples, ignore_index=True) if samples else pd.DataFrame(
+        columns=["USER_ID", "ITEM_ID", "TIMESTAMP", "_prob"]
+    )
+    per_user = pd.DataFrame({
+        "events": sample.groupby("USER_ID").size(),
+        "unique_events": sample.drop_duplicates(diagnostic.INTERACTIONS_REQUIRED_FIELDS)
+            .groupby("USER_ID").size(),
+        "pairs": sample.drop_duplicates(["USER_ID", "ITEM_ID"]).groupby("USER_ID").size(),
+        "_prob": sample.groupby("USER_ID")["_prob"].first(),
+    })
+    dups = (per_user["events"] - per_user["unique_events"]).values
+    repeats = (per_user["unique_events"] - per_user["pairs"]).values
+    user_prob = per_user["_prob"].values
+
+    stats = {"n_rows": n_rows, "n_sampled_users": len(per_user), "n_sampled_events": len(sample)}
+    print("\n=== Approximate interactions diagnostics, original shape={} ===\n".format(df.shape))
+    print("sampled {} events of {} users (seed={})".format(len(sample), len(per_user), seed))
+
+    na_rate = 1 - n_valid / n_rows if n_rows else 0.0
+    diagnostic.check_missing_rate(na_rate)
+    stats["na_rate"] = (na_rate, 0.0)
+
+    # (ratios of estimated totals over the sampled users, as each user's events are all sampled or none)
+    events = per_user["events"].values
+    dup_rate, var_dup = _ht_ratio(dups, events, user_prob)
+    stats["dup_rate"] = (dup_rate, Z_95 * np.sqrt(var_dup) if n_valid else 0.0)
+    diagnostic.check_duplication_rate(dup_rate)
+    print("  +/- {:.2g} (95% CI)".format(stats["dup_rate"][1]))
+
+    repeat_rate, var_repeat = _ht_ratio(repeats, per_user["unique_events"].values, user_prob)
+    stats["repeat_rate"] = (repeat_rate, Z_95 * np.sqrt(var_repeat) if n_valid else 0.0)
+    diagnostic.check_repeat_rate(repeat_rate)
+    print("  +/- {:.2g} (95% CI)".format(stats["repeat_rate"][1]))
+
+    for field, name in (("USER_ID", "users"), ("ITEM_ID", "items")):
+        hll = distinct[field]
+        stats["n_" + name] = (hll.estimate(), Z_95 * hll.relative_error * hll.estimate())
+        print("\ndistinct {}: {:.0f} +/- {:.0f} (95% CI)".format(name, *stats["n_" + name]))
+        print("\n=== {} top {} categories (count bounds) ===".format(field, diagnostic.CATS_FREQ_HEAD))
+        print(top[field].top(diagnostic.CATS_FREQ_HEAD))
+        stats["top_" + name] = top[field]
+
+    # (with the thresholds analyze_users / analyze_items check)
+    for field, name, coldstart_threshold in (
+        ("USER_ID", "user", diagnostic.COLDSTART_RATE_THRESHOLD),
+        ("ITEM_ID", "item", diagnostic.NA_RATE_THRESHOLD),
+    ):
+        if field not in table_hashes:
+            continue
+        missing_rate = n_missing_meta[field] / n_rows if n_rows else 0.0
+        coldstart_rate = 1 - table_seen[field].mean() if len(table_seen[field]) else 0.0
+        print("\nMissing rate of all {} meta-data".format(name), missing_rate)
+        if missing_rate > diagnostic.NA_RATE_THRESHOLD:
+            warnings.warn("High missing rate of all {} meta-data ({:%})!".format(name, missing_rate))
+        print("{} coldstart rate".format(name.capitalize()), coldstart_rate)
+        if coldstart_rate > coldstart_threshold:
+            warnings.warn("High {} coldstart rate ({:%})!".format(name, coldstart_rate))
+        stats[name + "_missing_rate"] = (missing_rate, 0.0)
+        stats[name + "_coldstart_rate"] = (coldstart_rate, 0.0)
+    return stats
@@ -0,0 +1,274 @@
+"""Out-of-core (chunked) interactions diagnostics, for logs too big to analyze as one in-memory DataFrame
+
+diagnostic.analyze_interactions needs the whole table in memory (plus several copies of it). Instead,
+analyze_interactions_stream consumes a record stream (e.g. from dataformat.datafile_reader or
+data_folder_reader) a chunk at a time, and reports the same statistics from three passes:
+
+1. Normalize each chunk of records to (USER_ID, ITEM_ID, TIMESTAMP), counting missing rows, and spill the
+   valid rows to temporary files partitioned by a hash of USER_ID
+2. Per partition (so every user's events are together): de-duplicate (user, item, timestamp)s and keep
+   each user-item pair's last event, accumulating the rates, activity patterns and category counts
+3. Re-read the de-duplicated events, accumulating the time bucket x item counts for each frequency
+
+Peak memory is bounded by the chunk size, the partition size (about the number of rows / n_partitions),
+and the item count matrices (as for the in-memory path). Results match diagnostic.analyze_interactions on
+the same data, except that:
+
+- Rows with a missing USER_ID or ITEM_ID count as missing (the in-memory path converts them to strings)
+- Only USER_ID and ITEM_ID are described (no describe(include="all") or other categorical fields)
+- The session time delta and user time span statistics, which need every event in memory, are skipped
+- The bootstrap splits are (as always) random, and USER_ID top categories are exact only if the IDs don't
+  contain the '|' category separator
+"""
+
+# Python Built-Ins:
+from itertools import islice
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+# External Dependencies:
+import numpy as np
+import pandas as pd
+
+# Local Dependencies:
+from . import dataformat
+from . import diagnostic
+
+DEFAULT_CHUNK_SIZE = 1000000
+DEFAULT_PARTITIONS = 64
+
+
+def _spill(f, df: pd.DataFrame) -> None:
+    pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_spill(path: str) -> Iterator[pd.DataFrame]:
+    """Yield the DataFrames _spill()ed to a file, in order"""
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _normalize_chunk(extract, chunk: Iterable[Dict[str, Any]]):
+    """(users, items, timestamps, n_missing) of a chunk of records, by dataformat.INTERACTION_FIELDS"""
+    users = []
+    items = []
+    timestamps = []
+    n_missing = 0
+    for record in chunk:
+        try:
+            user_id, item_id, timestamp, _ = extract(record)
+        except (TypeError, ValueError):
+            # Invalid timestamp or value: Work out which, field by field
+            try:
+                timestamp = dataformat.get_interaction_timestamp(record)
+            except (TypeError, ValueError):
+                n_missing += 1
+                continue
+            user_id = dataformat.get_interaction_user_id(record)
+            item_id = dataformat.get_interaction_item_id(record)
+        if user_id is None or item_id is None:
+            n_missing += 1
+            continue
+        users.append(str(user_id))
+        items.append(str(item_id))
+        timestamps.append(timestamp)
+    return users, items, timestamps, n_missing
+
+
+def _time_buckets(times: pd.DatetimeIndex, freq: str, origin: pd.Timestamp):
+    """Group key for `times` matching pd.Grouper(freq=freq) over the whole dataset starting at `origin`"""
+    try:
+        step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq).nanos, "ns")
+    except ValueError:
+        # Non-fixed frequencies (month/quarter/year ends) are anchored, regardless of where the data starts
+        return pd.Grouper(freq=freq)
+    # Fixed frequencies count from the first day's midnight (the default origin="start_day"):
+    return origin + (times - origin) // step * step
+
+
+def analyze_interactions_stream(
+    records: Iterable[Dict[str, Any]],
+    chunk_size: int=DEFAULT_CHUNK_SIZE,
+    n_partitions: int=DEFAULT_PARTITIONS,
+    tmp_dir: Optional[str]=None,
+) -> Dict[str, Any]:
+    """Interactions diagnostics (as diagnostic.analyze_interactions) of a stream bigger than memory
+
+    Parameters
+    ----------
+    records :
+        Raw interaction records e.g. from dataformat.datafile_reader / data_folder_reader, normalized by
+        dataformat.INTERACTION_FIELDS
+    chunk_size : Optional
+        Number of records normalized (and spilled) at a time
+    n_partitions : Optional
+        Number of user partitions the records are spilled to: Increase this for datasets bigger than about
+        n_partitions * chunk_size rows, to keep each partition about chunk_size rows
+    tmp_dir : Optional
+        Folder for the spill files (default: the system temp folder). They're deleted when done
+
+    Returns
+    -------
+    stats :
+        Dict of the computed n_rows, na_rate, dup_rate, repeat_rate, hourly, dayofweek, daily (event count
+        Series), summary (describe_category_counts results) and item_counts ({freq: compute_item_counts
+        output})
+    """
+    work_dir = tempfile.mkdtemp(prefix="diagnostic-", dir=tmp_dir)
+    try:
+        return _analyze_interactions_stream(records, chunk_size, n_partitions, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _analyze_interactions_stream(records, chunk_size, n_partitions, work_dir):
+    # Pass 1: normalize and partition by user
+    item_vocab = {}
+    n_rows = 0
+    n_missing = 0
+    part_paths = [os.path.join(work_dir, f"part-{ix:04d}.pkl") for ix in range(n_partitions)]
+    part_files = [open(path, "wb") for path in part_paths]
+    try:
+        extract, records = dataformat.detect_extractor(records, dataformat.INTERACTION_FIELDS)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            n_rows += len(chunk)
+            users, items, timestamps, n_chunk_missing = _normalize_chunk(extract, chunk)
+            del chunk
+            n_missing += n_chunk_missing
+            if not users:
+                continue
+            users = np.array(users, dtype=object)
+            item_codes, item_uniques = pd.factorize(np.array(items, dtype=object))
+            del items
+            vocab_codes = np.array(
+                [item_vocab.setdefault(item_id, len(item_vocab)) for item_id in item_uniques],
+                dtype=np.int32,
+            )
+            df = pd.DataFrame({
+                "USER_ID": users,
+                "ITEM_ID": vocab_codes[item_codes],
+                "TIMESTAMP": np.array(timestamps, dtype=np.int64),
+            })
+            part_ids = pd.util.hash_array(users) % n_partitions
+            for part_id, df_part in df.groupby(part_ids, sort=False):
+                _spill(part_files[part_id], df_part)
+    finally:
+        for f in part_files:
+            f.close()
+
+    print("\n=== Interactions stream, original rows={} ===\n".format(n_rows))
+    na_rate = n_missing / n_rows if n_rows else 0.0
+    diagnostic.check_missing_rate(na_rate)
+    n_valid = n_rows - n_missing
+    print("dropna rows", n_valid)
+
+    # Pass 2: de-duplicate within each user partition
+    n_events = 0
+    n_pairs = 0
+    hourly = pd.Series(dtype=np.int64)
+    dayofweek = pd.Series(dtype=np.int64)
+    daily = pd.Series(dtype=np.int64)
+    item_freq = np.zeros(len(item_vocab), dtype=np.int64)
+    user_freq = []
+    user_head = []
+    ts_min = None
+    dedup_path = os.path.join(work_dir, "dedup.pkl")
+    with open(dedup_path, "wb") as dedup_file:
+        for path in part_paths:
+            parts = list(_read_spill(path))
+            os.remove(path)
+            if not parts:
+                continue
+            df = pd.concat(parts, ignore_index=True)
+            del parts
+            df = df.drop_duplicates(subset=diagnostic.INTERACTIONS_REQUIRED_FIELDS)
+            n_events += len(df)
+
+            times = pd.DatetimeIndex(df["TIMESTAMP"].values.astype("datetime64[s]"))
+            hourly = hourly.add(times.hour.value_counts(), fill_value=0)
+            dayofweek = dayofweek.add(times.dayofweek.value_counts(), fill_value=0)
+            daily = daily.add(pd.Series(times.date).value_counts(), fill_value=0)
+            del times
+            item_freq += np.bincount(df["ITEM_ID"].values, minlength=len(item_vocab))
+            user_sizes = df.groupby("USER_ID").size()
+            user_sizes = diagnostic._category_counts(user_sizes.index, user_sizes.values)
+            user_freq.append(user_sizes.values)
+            user_head.append(user_sizes.head(diagnostic.CATS_FREQ_HEAD))
+            del user_sizes
+
+            # each user-item pair's last event, as the in-memory stable sort + drop_duplicates(keep='last'):
+            df_dedup = df.sort_values("TIMESTAMP", kind="mergesort").drop_duplicates(
+                ["USER_ID", "ITEM_ID"], keep="last")
+            n_pairs += len(df_dedup)
+            if len(df_dedup):
+                part_min = df_dedup["TIMESTAMP"].min()
+                ts_min = part_min if ts_min is None else min(ts_min, part_min)
+                _spill(dedup_file, df_dedup[["ITEM_ID", "TIMESTAMP"]].reset_index(drop=True))
+            del df, df_dedup
+
+    dup_rate = (n_valid - n_events) / n_valid if n_valid else 0.0
+    diagnostic.check_duplication_rate(dup_rate)
+    print("drop_duplicates rows", n_events)
+    repeat_rate = (n_events - n_pairs) / n_events if n_events else 0.0
+    diagnostic.check_repeat_rate(repeat_rate)
+
+    summary = {}
+    user_freq = pd.Series(np.sort(np.concatenate(user_freq or [[]]))[::-1])
+    user_head = pd.concat(user_head) if user_head else pd.Series(dtype=np.int64)
+    summary_cn = diagnostic.describe_category_counts(
+        user_freq, "USER_ID", head=user_head.sort_values(ascending=False))
+    if summary_cn is not None:
+        summary["USER_ID"] = summary_cn
+    item_freq = diagnostic._category_counts(list(item_vocab), item_freq)
+    summary_cn = diagnostic.describe_category_counts(item_freq, "ITEM_ID")
+    if summary_cn is not None:
+        summary["ITEM_ID"] = summary_cn
+
+    hourly, dayofweek, daily = (s.astype(np.int64).sort_index() for s in (hourly, dayofweek, daily))
+    diagnostic.analyze_activity_patterns(hourly, dayofweek, daily)
+
+    # Pass 3: time bucket x item counts of the de-duplicated events, for every frequency
+    print("\n=== Temporal shift analysis ===\n")
+    freqs = list(dict.fromkeys(diagnostic.RETRAIN_FREQUENCY + diagnostic.TEMPORAL_FREQUENCY))
+    origin = pd.Timestamp(np.datetime64(int(ts_min or 0), "s")).floor("D")
+    # (folding each partition's counts into running totals, so memory stays at one count table per frequency)
+    cnt_totals = {freq: None for freq in freqs}
+    for df_dedup in _read_spill(dedup_path):
+        times = pd.DatetimeIndex(df_dedup["TIMESTAMP"].values.astype("datetime64[s]"))
+        keys = pd.DataFrame(
+            {"_bs": np.random.rand(len(df_dedup))<0.5, "_j": df_dedup["ITEM_ID"].values},
+            index=times,
+        )
+        for freq in freqs:
+            cnt = keys.groupby(["_bs", _time_buckets(times, freq, origin), "_j"]).size()
+            cnt_totals[freq] = cnt if cnt_totals[freq] is None else cnt_totals[freq].add(cnt, fill_value=0)
+            del cnt
+    item_counts = {}
+    for freq in freqs:
+        df_cnt = cnt_totals.pop(freq).astype(np.int64).to_frame("_cnt").reset_index(level=(0, 2))
+        item_counts[freq] = diagnostic.item_counts_from_groups(
+            df_cnt, len(item_vocab), freq, hist_lens=diagnostic._temporal_hist_lens(freq))
+
+    diagnostic.analyze_temporal_shift(item_counts)
+
+    return {
+        "n_rows": n_rows,
+        "na_rate": na_rate,
+        "dup_rate": dup_rate,
+        "repeat_rate": repeat_rate,
+        "hourly": hourly,
+        "dayofweek": dayofweek,
+        "daily": daily,
+        "summary": summary,
+        "item_counts": item_counts,
+    }
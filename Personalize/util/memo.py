@@ -0,0 +1,266 @@
+"""Fingerprint-keyed on-disk memoization of expensive (diagnostic) results, for fast repeat runs
+
+A memoized function's result is pickled into a cache folder, keyed by its qualified name, the source of its
+module, FORMAT_VERSION and a fast content fingerprint of its arguments, so re-running an analysis on unchanged
+data (even after a restart) just loads the results. Anything the call printed is stored alongside and
+re-printed on a hit, after a CACHED_NOTE line so e.g. printed timings aren't mistaken for the current run's.
+The folder is kept under a size bound by evicting the least recently used results.
+
+Memoization is off (memoized functions are called straight through) until a cache is enabled, with enable()
+or the using() context manager, so nothing is written to disk unasked.
+
+Memoized functions must only depend on their arguments (pass any settings they use as arguments) and on code
+in their own module: editing that module invalidates its results, but a change elsewhere affecting them (e.g.
+in another module they call) needs a FORMAT_VERSION bump. Results that no longer unpickle (e.g. after a
+library upgrade) are simply recomputed.
+"""
+
+# Python Built-Ins:
+from contextlib import contextmanager, redirect_stdout
+import functools
+import hashlib
+import inspect
+import io
+import os
+import pickle
+import sys
+from typing import Any, Callable, Iterable, Optional, Tuple, Union
+
+# External Dependencies:
+import numpy as np
+import pandas as pd
+import scipy.sparse as ss
+
+FORMAT_VERSION = 1
+DEFAULT_MAX_BYTES = 2**30
+CACHED_NOTE = "({}: cached result, anything printed below is from the run that computed it)"
+
+_active_cache = None
+
+
+def _update_fingerprint(h: "hashlib._Hash", obj: Any) -> None:
+    """Feed obj's type, shape and content into hash `h`, hashing array data rather than pickling it"""
+    h.update(type(obj).__name__.encode("utf-8"))
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        h.update(repr(obj).encode("utf-8"))
+    elif isinstance(obj, np.ndarray):
+        h.update(f"{obj.dtype.str}{obj.shape}".encode("utf-8"))
+        if obj.dtype == object:
+            # (hashed by value, including their str for mixed types)
+            h.update(pd.util.hash_array(obj.ravel()).tobytes())
+        else:
+            h.update(np.ascontiguousarray(obj).view(np.uint8).ravel())
+    elif isinstance(obj, pd.DataFrame):
+        _update_fingerprint(h, obj.index)
+        for cn in obj.columns:
+            _update_fingerprint(h, cn)
+            _update_fingerprint(h, obj[cn].values)
+    elif isinstance(obj, pd.Series):
+        _update_fingerprint(h, obj.name)
+        _update_fingerprint(h, obj.index)
+        _update_fingerprint(h, obj.values)
+    elif isinstance(obj, pd.Categorical):
+        _update_fingerprint(h, obj.categories)
+        _update_fingerprint(h, obj.codes)
+    elif isinstance(obj, pd.MultiIndex):
+        _update_fingerprint(h, pd.util.hash_pandas_object(obj, index=False).values)
+    elif isinstance(obj, (pd.Index, pd.api.extensions.ExtensionArray)):
+        h.update(str(obj.dtype).encode("utf-8"))
+        _update_fingerprint(h, np.asarray(obj))
+    elif ss.issparse(obj):
+        obj = ss.csr_matrix(obj)
+        for part in (obj.shape, obj.data, obj.indices, obj.indptr):
+            _update_fingerprint(h, part)
+    elif isinstance(obj, (list, tuple)):
+        h.update(str(len(obj)).encode("utf-8"))
+        for item in obj:
+            _update_fingerprint(h, item)
+    elif isinstance(obj, dict):
+        h.update(str(len(obj)).encode("utf-8"))
+        for key in sorted(obj, key=repr):
+            _update_fingerprint(h, key)
+            _update_fingerprint(h, obj[key])
+    else:
+        h.update(pickle.dumps(obj, protocol=4))
+
+
+def fingerprint(*objs: Any) -> str:
+    """Hex digest of the content of objs (arrays, pandas/scipy.sparse objects, containers and scalars)
+
+    Equal content gives the same fingerprint in any process or session, without pickling or converting data.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    _update_fingerprint(h, objs)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """A folder of pickled results by key, kept under max_bytes by evicting the least recently used
+
+    Parameters
+    ----------
+    cache_dir :
+        Folder to keep the results in (created if needed)
+    max_bytes : Optional
+        Total size to keep the folder within (default 1 GiB)
+    """
+    def __init__(self, cache_dir: str, max_bytes: int=DEFAULT_MAX_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """(True, result) if key is cached (marking it most recently used), else (False, None)"""
+        path = self._path(key)
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return False, None
+        try:
+            with f:
+                value = pickle.load(f)
+        except Exception:
+            # Truncated, or no longer loadable (e.g. pickled by other library versions): recompute it
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return False, None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True, value
+
+    def put(self, key: str, value: Any) -> None:
+        """Cache value under key (if it pickles within max_bytes), then evict down to max_bytes"""
+        try:
+            data = pickle.dumps(value, protocol=4)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        if len(data) > self.max_bytes:
+            return
+        # Write to a temporary file and swap in, so an interrupted write never looks valid:
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            # (e.g. disk full: the result just isn't cached)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """Delete the least recently used results until the folder is within max_bytes"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pkl"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pkl"):
+                os.remove(entry.path)
+
+
+def enable(cache_dir: str, max_bytes: int=DEFAULT_MAX_BYTES) -> ResultCache:
+    """Memoize in cache_dir from now on (see ResultCache), returning the cache"""
+    global _active_cache
+    _active_cache = ResultCache(cache_dir, max_bytes)
+    return _active_cache
+
+
+def disable() -> None:
+    global _active_cache
+    _active_cache = None
+
+
+def active() -> Optional[ResultCache]:
+    """The cache memoized functions currently use, if any"""
+    return _active_cache
+
+
+@contextmanager
+def using(cache: Union[None, str, ResultCache], max_bytes: int=DEFAULT_MAX_BYTES):
+    """Memoize in `cache` (a ResultCache, or folder for one) within the block: None keeps the current cache"""
+    global _active_cache
+    previous = _active_cache
+    if isinstance(cache, str):
+        cache = ResultCache(cache, max_bytes)
+    if cache is not None:
+        _active_cache = cache
+    try:
+        yield _active_cache
+    finally:
+        _active_cache = previous
+
+
+def memoize(fn: Optional[Callable]=None, ignore: Iterable[str]=()) -> Callable:
+    """Decorator memoizing fn's result and printed output in the active cache (if any)
+
+    Parameters
+    ----------
+    fn :
+        Function to memoize (or omit, to use as `@memoize(ignore=...)`)
+    ignore : Optional
+        Names of arguments left out of the key, e.g. random draws whose cached values are as good as new ones
+    """
+    if fn is None:
+        return functools.partial(memoize, ignore=ignore)
+    ignore = set(ignore)
+    signature = inspect.signature(fn)
+    name = f"{fn.__module__}.{fn.__qualname__}"
+    try:
+        source = inspect.getsource(sys.modules[fn.__module__])
+    except (KeyError, OSError, TypeError):
+        source = inspect.getsource(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        cache = _active_cache
+        if cache is None:
+            return fn(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = fingerprint(
+            name,
+            source,
+            FORMAT_VERSION,
+            {arg: value for arg, value in bound.arguments.items() if arg not in ignore},
+        )
+        hit, value = cache.get(key)
+        if hit:
+            result, printed = value
+            if printed:
+                print(CACHED_NOTE.format(name))
+                print(printed, end="")
+            return result
+        printed = io.StringIO()
+        with redirect_stdout(printed):
+            result = fn(*args, **kwargs)
+        print(printed.getvalue(), end="")
+        cache.put(key, (result, printed.getvalue()))
+        return result
+
+    return wrapper
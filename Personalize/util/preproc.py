@@ -5,19 +5,47 @@ See the "UCSD Preprocessing.ipynb" notebook for more details on the use case
 
 # Python Built-Ins:
 import json
-from typing import BinaryIO, Set, Union
-import zlib
+import random
+from typing import BinaryIO, Optional, Set, Tuple, Union
 
 # Local Dependencies:
-from dataformat import json_gz_reader
-from nullcontext import nullcontext
+from dataformat import json_gz_reader, ParallelGzipWriter
+
+def count_used_items(
+    fin: Union[BinaryIO, str],
+    asin_set: Set[str],
+    encoding: str="utf-8",
+) -> Tuple[int, int]:
+    """Count the (used, unused) items in a .json.gz file of product data, by `item["asin"] in asin_set`"""
+    n_items_seen = 0
+    n_used_items = 0
+    for item in json_gz_reader(fin, encoding=encoding):
+        n_items_seen += 1
+        if (item["asin"] in asin_set):
+            n_used_items += 1
+    return n_used_items, n_items_seen - n_used_items
+
+def cold_start_target(n_used_items: int, n_unused_items: int, max_cold_start: float) -> int:
+    """Largest number of unused items (up to n_unused_items) keeping the unused ratio <= max_cold_start"""
+    if max_cold_start >= 1:
+        return n_unused_items
+    # Estimate, then correct for any floating-point error:
+    n_target = min(n_unused_items, max(0, int(max_cold_start * n_used_items / (1 - max_cold_start))))
+    while n_target < n_unused_items and (n_target + 1) / (n_used_items + n_target + 1) <= max_cold_start:
+        n_target += 1
+    while n_target > 0 and n_target / (n_used_items + n_target) > max_cold_start:
+        n_target -= 1
+    return n_target
 
 def remove_unused_items(
     fin: Union[BinaryIO, str],
     fout: Union[BinaryIO, str],
     asin_set: Set[str],
     max_cold_start: float=0.01,
-    encoding: str="utf-8"
+    encoding: str="utf-8",
+    n_workers: Optional[int]=None,
+    sampling: str="greedy",
+    seed: Optional[int]=None,
 ) -> None:
     """Copy item metadata file including no more than max_cold_start ratio of unlisted items
 
@@ -29,6 +57,11 @@ def remove_unused_items(
     guaranteed to be close to max_cold_start (e.g. if all of the seen `asin_set` items are at the
     end of the file)
 
+    With `sampling="exact"`, `fin` is instead read twice: First counting the used and unused items, then
+    keeping a uniformly random sample of exactly as many unused items as fit the ratio (the most for which
+    unlisted/total <= `max_cold_start`). The sample is selected sequentially with constant memory, and
+    reproducible for a given `seed`. `fin` must be a path or a seekable handle in this mode.
+
     Parameters
     ----------
     fin : Union[BinaryIO, str]
@@ -41,21 +74,51 @@ def remove_unused_items(
         Maximum ratio of un-listed item IDs to allow through
     encoding : str, optional
         Applied to both input and output files
+    n_workers : int, optional
+        Number of threads compressing the output (as a multi-member gzip, see ParallelGzipWriter). Default:
+        CPU count
+    sampling : str, optional
+        "greedy" (single-pass, default) or "exact" (two-pass) selection of unlisted items, as above
+    seed : int, optional
+        Random seed for `sampling="exact"`
     """
+    if sampling == "exact":
+        if not isinstance(fin, str):
+            if not fin.seekable():
+                raise ValueError("sampling='exact' reads fin twice, so needs a file path or seekable handle")
+            start = fin.tell()
+        n_used_total, n_unused_total = count_used_items(fin, asin_set, encoding=encoding)
+        if not isinstance(fin, str):
+            fin.seek(start)
+        n_unused_target = cold_start_target(n_used_total, n_unused_total, max_cold_start)
+        print(f"Sampling {n_unused_target} of {n_unused_total} unused items")
+        rng = random.Random(seed)
+        n_unused_seen = 0
+    elif sampling != "greedy":
+        raise ValueError(f"sampling must be 'greedy' or 'exact', got {sampling}")
+
     n_items_seen = 0
     n_used_items = 0
     n_unused_items_kept = 0
     prefix = "" # Overwriting var more performant than "if at least one item has been written"
 
-    ctx = open(fout, "wb") if isinstance(fout, str) else nullcontext(fout)
-    with ctx as outfile:
-        cmp = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)  # offset 16 to include header
+    with ParallelGzipWriter(fout, n_workers=n_workers) as outfile:
         for item in json_gz_reader(fin, encoding=encoding):
             n_items_seen += 1
             keep_item = False
             if (item["asin"] in asin_set):
                 n_used_items += 1
                 keep_item = True
+            elif sampling == "exact":
+                # Selection sampling: keep with P = (still needed) / (still to come), which selects
+                # exactly n_unused_target items with all subsets equally likely
+                if (
+                    rng.random() * (n_unused_total - n_unused_seen)
+                    < n_unused_target - n_unused_items_kept
+                ):
+                    n_unused_items_kept += 1
+                    keep_item = True
+                n_unused_seen += 1
             elif (
                 (n_unused_items_kept + 1) / (n_used_items + n_unused_items_kept + 1)
                 < max_cold_start
@@ -63,13 +126,9 @@ def remove_unused_items(
                 n_unused_items_kept += 1
                 keep_item = True
             if keep_item:
-                chunk = cmp.compress((prefix + json.dumps(item)).encode(encoding))
+                # (Compression happens on background threads, in blocks, as the writer's buffer fills)
+                outfile.write((prefix + json.dumps(item)).encode(encoding))
                 prefix = "\n"
-                if chunk:
-                    outfile.write(chunk)
-        chunk = cmp.flush()
-        if chunk:
-            outfile.write(chunk)
 
     print("Done!")
     print(f"Saw {n_items_seen} items")
@@ -0,0 +1,136 @@
+"""Vectorized (numpy) probabilistic sketches for approximate diagnostics of very large datasets
+
+All sketches take pre-hashed uint64 values (see hash_labels) so each ID column only needs hashing once, and
+are mergeable, so they can be built a chunk at a time.
+"""
+
+# Python Built-Ins:
+from typing import Optional
+
+# External Dependencies:
+import numpy as np
+import pandas as pd
+
+
+def hash_labels(labels) -> np.ndarray:
+    """uint64 hash of each label's str (so e.g. 1 and "1" hash the same, as diagnostic.factorize_ids)"""
+    return pd.util.hash_array(pd.Index(labels, dtype=object).astype(str).values.astype(object))
+
+
+def hash_ids(values) -> np.ndarray:
+    """hash_labels of each value, only converting and hashing the distinct values"""
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=False)
+    return hash_labels(uniques)[codes]
+
+
+def uniform_from_hash(hashes: np.ndarray, seed: int=0) -> np.ndarray:
+    """Deterministic pseudo-random floats in [0, 1), one per hash, re-drawn independently for each seed"""
+    salt = np.random.default_rng(seed).integers(0, 2**63, dtype=np.uint64)
+    mixed = pd.util.hash_array(np.asarray(hashes, dtype=np.uint64) ^ salt)
+    return (mixed >> np.uint64(11)) * 2.0**-53
+
+
+class HyperLogLog:
+    """Approximate distinct count, with relative standard error 1.04 / sqrt(2**precision)
+
+    Parameters
+    ----------
+    precision :
+        Number of hash bits selecting the register: 2**precision one-byte registers are kept
+    """
+    def __init__(self, precision: int=14):
+        self.precision = precision
+        self.registers = np.zeros(2**precision, dtype=np.uint8)
+
+    def add(self, hashes: np.ndarray) -> None:
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        n_rest = 64 - self.precision
+        index = (hashes >> np.uint64(n_rest)).astype(np.intp)
+        rest = hashes & np.uint64((1 << n_rest) - 1)
+        # rank = position of the first 1 bit in the remaining (< 2**53, so exactly float-converted) bits:
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        np.maximum.at(self.registers, index, (n_rest - bit_length + 1).astype(np.uint8))
+
+    def merge(self, other: "HyperLogLog") -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    @property
+    def relative_error(self) -> float:
+        """Relative standard error of the estimate"""
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        n_zero = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and n_zero:
+            # Small range correction (linear counting):
+            estimate = m * np.log(m / n_zero)
+        return float(estimate)
+
+
+class CountMinSketch:
+    """Approximate counts of hashed values, never under-estimated
+
+    Each estimate exceeds the true count by at most e * total / width, with probability 1 - e**-depth.
+    """
+    def __init__(self, width: int=2**20, depth: int=4, seed: int=0):
+        self.width = width
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.salts = np.random.default_rng(seed).integers(0, 2**63, size=depth, dtype=np.uint64)
+        self.total = 0
+
+    def _columns(self, hashes: np.ndarray):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        return [pd.util.hash_array(hashes ^ salt) % np.uint64(self.width) for salt in self.salts]
+
+    def add(self, hashes: np.ndarray, counts: Optional[np.ndarray]=None) -> None:
+        for row, columns in zip(self.table, self._columns(hashes)):
+            row += np.bincount(columns.astype(np.intp), weights=counts, minlength=self.width).astype(np.int64)
+        self.total += len(hashes) if counts is None else int(np.sum(counts))
+
+    def merge(self, other: "CountMinSketch") -> None:
+        self.table += other.table
+        self.total += other.total
+
+    @property
+    def error(self) -> float:
+        """Bound on the over-estimate of each count (with probability 1 - e**-depth)"""
+        return np.e * self.total / self.width
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        estimate = None
+        for row, columns in zip(self.table, self._columns(hashes)):
+            row_estimate = row[columns.astype(np.intp)]
+            estimate = row_estimate if estimate is None else np.minimum(estimate, row_estimate)
+        return estimate
+
+
+class HeavyHitters:
+    """Top categories by count: the mergeable space-saving (Misra-Gries) summary of `capacity` counters
+
+    Updated with exact counts a chunk at a time. Every kept count under-estimates the true count by at most
+    `error` (<= total / (capacity + 1)), and any category with a true count over `error` is kept.
+    """
+    def __init__(self, capacity: int=1000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.error = 0
+        self.total = 0
+
+    def update(self, counts: pd.Series, total: Optional[int]=None) -> None:
+        """Add a chunk's {category: count} Series, of `total` counts if some small categories were left out"""
+        self.total += int(counts.sum()) if total is None else total
+        counts = self.counts.add(counts, fill_value=0).astype(np.int64)
+        if len(counts) > self.capacity:
+            # Decrement every counter by the (capacity+1)th largest, keeping the positive ones:
+            threshold = int(counts.nlargest(self.capacity + 1).iloc[-1])
+            counts = counts[counts > threshold] - threshold
+            self.error += threshold
+        self.counts = counts
+
+    def top(self, k: int) -> pd.DataFrame:
+        """The k top categories' lower and upper count bounds, by descending lower bound"""
+        top = self.counts.sort_values(ascending=False).head(k)
+        return pd.DataFrame({"count_min": top, "count_max": top + self.error})
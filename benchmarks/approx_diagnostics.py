@@ -0,0 +1,113 @@
+"""Check the accuracy (and speed) of diagnostic_approx.analyze_interactions_approx against exact results
+
+Generates a synthetic interactions table (with heavy users, duplicate events and repeated user-items) plus
+users and items tables, computes the exact rates, distinct counts and top categories, then runs the
+approximate mode at each sample fraction, checking every estimate lies within its reported 95% error bound of
+the exact value, and reports its speedup over the exact computation e.g:
+
+    cd Personalize && python ../benchmarks/approx_diagnostics.py --rows 5000000 --sample-fracs 0.001 0.01 0.1
+"""
+
+# Python Built-Ins:
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import warnings
+
+# External Dependencies:
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Personalize"))
+from util import diagnostic, diagnostic_approx
+
+
+def generate(n_rows, n_users, n_items, seed=42):
+    rng = np.random.default_rng(seed)
+    # Pareto distributed user activity, so a few heavy users hold many of the events:
+    user_weights = np.cumsum(rng.pareto(1.5, n_users) + 1)
+    columns = {
+        "USER_ID": np.searchsorted(user_weights, rng.random(n_rows) * user_weights[-1]),
+        "ITEM_ID": rng.zipf(1.3, n_rows) % n_items,
+        "TIMESTAMP": (1500000000 + rng.integers(0, 3600 * 24 * 30, n_rows)).astype(np.float64),
+    }
+    # Repeat some events exactly (column by column, keeping the integer IDs' dtypes), and drop some timestamps:
+    dup = np.flatnonzero(rng.random(n_rows - 1) < 0.05) + 1
+    for values in columns.values():
+        values[dup] = values[dup - 1]
+    columns["TIMESTAMP"][rng.random(n_rows) < 0.01] = np.nan
+    df = pd.DataFrame(columns)
+    df["USER_ID"] = "U" + df["USER_ID"].astype(str)
+    # (with some users listed twice, as cold-start rates are per table row)
+    user_ids = [f"U{u}" for u in range(0, n_users, 2)]
+    users = pd.DataFrame({"USER_ID": user_ids + user_ids[:len(user_ids) // 10]})
+    items = pd.DataFrame({"ITEM_ID": np.arange(0, int(n_items * 1.2), 3)})
+    return df, users, items
+
+
+def exact_stats(df, users, items):
+    """The same statistics, exactly (as analyze_interactions / analyze_users / analyze_items compute them)"""
+    stats = {"na_rate": df["TIMESTAMP"].isnull().mean()}
+    for field, name, table in (("USER_ID", "user", users), ("ITEM_ID", "item", items)):
+        ids = diagnostic.factorize_ids(df[field])
+        table_codes = diagnostic.factorize_ids(table[field], categories=ids.categories).codes
+        n_ids = len(ids.categories)
+        stats[name + "_missing_rate"] = 1 - diagnostic._code_isin(ids.codes, table_codes, n_ids).mean()
+        stats[name + "_coldstart_rate"] = 1 - diagnostic._code_isin(table_codes, ids.codes, n_ids).mean()
+    df = df.dropna(subset=["TIMESTAMP"])
+    user_codes = diagnostic.factorize_ids(df["USER_ID"]).codes
+    item_codes = diagnostic.factorize_ids(df["ITEM_ID"]).codes
+    for field, codes in (("users", user_codes), ("items", item_codes)):
+        stats["n_" + field] = len(np.unique(codes))
+        counts = np.bincount(codes)
+        labels = diagnostic.factorize_ids(df["USER_ID" if field == "users" else "ITEM_ID"]).categories
+        stats["top_" + field] = diagnostic._category_counts(labels, counts)
+    pair_key = diagnostic._combined_key(user_codes, item_codes)
+    is_dup = pd.Index(diagnostic._combined_key(pair_key, pd.factorize(df["TIMESTAMP"])[0])).duplicated()
+    stats["dup_rate"] = is_dup.mean()
+    stats["repeat_rate"] = pd.Index(pair_key[~is_dup]).duplicated().mean()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000000)
+    parser.add_argument("--users", type=int, default=500000)
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--sample-fracs", type=float, nargs="+", default=[0.001, 0.01, 0.1])
+    args = parser.parse_args()
+
+    df, users, items = generate(args.rows, args.users, args.items)
+    t0 = time.perf_counter()
+    exact = exact_stats(df, users, items)
+    exact_secs = time.perf_counter() - t0
+    for key in ["user_missing_rate", "user_coldstart_rate", "item_missing_rate", "item_coldstart_rate"]:
+        assert 0 < exact[key] < 1, f"Degenerate {key}: the generated IDs should partly match the tables"
+    print(f"\n{args.rows} rows: exact statistics in {exact_secs:.2f}s")
+
+    for sample_frac in args.sample_fracs:
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            approx = diagnostic_approx.analyze_interactions_approx(df, users, items, sample_frac=sample_frac)
+        secs = time.perf_counter() - t0
+        print(f"\nsample_frac={sample_frac}: {secs:.2f}s ({exact_secs / secs:.1f}x faster than exact), "
+              f"{approx['n_sampled_events']} events sampled")
+        for key in [
+            "na_rate", "dup_rate", "repeat_rate", "n_users", "n_items",
+            "user_missing_rate", "user_coldstart_rate", "item_missing_rate", "item_coldstart_rate",
+        ]:
+            estimate, bound = approx[key]
+            print(f"  {key}: exact {exact[key]:.6g}, estimate {estimate:.6g} +/- {bound:.2g}")
+            assert abs(estimate - exact[key]) <= bound + 1e-12, key
+        for field in ("users", "items"):
+            top = approx["top_" + field].top(diagnostic.CATS_FREQ_HEAD)
+            true_counts = exact["top_" + field].reindex(top.index).values
+            assert ((top["count_min"] <= true_counts) & (true_counts <= top["count_max"])).all(), field
+            overlap = len(set(top.index) & set(exact["top_" + field].head(diagnostic.CATS_FREQ_HEAD).index))
+            print(f"  top {field}: {overlap}/{diagnostic.CATS_FREQ_HEAD} exact top categories found, "
+                  f"count error <= {approx['top_' + field].error}")
@@ -0,0 +1,83 @@
+"""Benchmark (and check equivalence of) diagnostic's vectorized category counts and per-user time statistics
+
+Compares describe_categorical's category sizes and compute_user_time_stats against the previous per-row
+apply(split) / groupby-apply implementations on synthetic data, e.g:
+
+    cd Personalize && python ../benchmarks/categorical_time_stats.py --rows 2000000
+"""
+
+# Python Built-Ins:
+import argparse
+import os
+import sys
+import time
+
+# External Dependencies:
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Personalize"))
+from util import diagnostic
+
+
+def category_counts_apply(sr):
+    """The previous describe_categorical counting, for reference"""
+    parts = sr.astype(str).apply(lambda x: x.split('|'))
+    cats = pd.Series(np.hstack(parts.values))
+    return cats.groupby(cats).size().sort_values(ascending=False)
+
+
+def category_counts_codes(sr):
+    ids = diagnostic.factorize_ids(sr)
+    counts = np.bincount(ids.codes[ids.codes >= 0], minlength=len(ids.categories))
+    return diagnostic._category_counts(ids.categories.astype(str), counts)
+
+
+def user_time_stats_groupby(df):
+    """The previous analyze_interactions per-user statistics, for reference"""
+    deltas = df.groupby("USER_ID")["TIMESTAMP"].transform(pd.Series.diff).dropna()
+    spans = df.groupby("USER_ID")["TIMESTAMP"].apply(lambda x: max(x) - min(x))
+    return deltas, spans
+
+
+def user_time_stats_sorted(df):
+    return diagnostic.compute_user_time_stats(pd.factorize(df["USER_ID"])[0], df["TIMESTAMP"])
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--categories", type=int, default=50000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    cat_ids = rng.zipf(1.3, args.rows) % args.categories
+    sr = pd.Series(
+        np.array([f"C{c}|G{c % 17}" if c % 3 == 0 else f"C{c}" for c in cat_ids], dtype=object),
+        name="GENRE",
+    )
+    df = pd.DataFrame({
+        "USER_ID": np.array([f"U{u}" for u in rng.integers(0, args.users, args.rows)], dtype=object),
+        "TIMESTAMP": np.sort(1500000000 + rng.integers(0, 3600 * 24 * 90, args.rows)),
+    })
+
+    expected, secs_apply = timed(category_counts_apply, sr)
+    result, secs_codes = timed(category_counts_codes, sr)
+    assert expected.index.equals(result.index) and (expected.values == result.values).all(), "Counts differ"
+    print(f"category counts: {secs_apply:.2f}s apply(split) -> {secs_codes:.2f}s vectorized")
+
+    (want_deltas, want_spans), secs_groupby = timed(user_time_stats_groupby, df)
+    (deltas, spans), secs_sorted = timed(user_time_stats_sorted, df)
+    for want, got in ((want_deltas, deltas), (want_spans, spans)):
+        want = want.sort_values(ascending=False)
+        got = got.sort_values(ascending=False)
+        assert (want.values == got.values).all() and want.describe().equals(got.describe()), "Stats differ"
+    print(f"user time stats: {secs_groupby:.2f}s groupby -> {secs_sorted:.2f}s sorted")
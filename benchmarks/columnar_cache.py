@@ -0,0 +1,108 @@
+"""Benchmark loading an interactions file via the columnar cache vs re-parsing it every time
+
+Generates a gzipped JSON-lines interactions file, then times the notebook-style load (datafile_reader into
+a DataFrame), the first (cache-building) columnar.load_interactions call and a warm (memory-mapped)
+reload, checking that the cached DataFrame matches the parsed one and that its columns (including the ID
+codes) are memory-mapped rather than copied into memory. Memory figures are traced (heap) allocations, so
+memory-mapped file pages don't count e.g:
+
+    cd Personalize && python ../benchmarks/columnar_cache.py --rows 2000000
+"""
+
+# Python Built-Ins:
+import argparse
+import gzip
+import json
+import mmap
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# External Dependencies:
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Personalize"))
+from util import columnar, dataformat
+
+
+def generate(path, n_rows, seed=42):
+    rng = random.Random(seed)
+    with gzip.open(path, "wt") as f:
+        for _ in range(n_rows):
+            f.write(json.dumps({
+                "reviewerID": f"A{rng.randrange(10**6):07d}",
+                "asin": f"B{rng.randrange(10**5):09d}",
+                "unixReviewTime": 1500000000 + rng.randrange(10**7),
+                "overall": float(rng.randint(1, 5)),
+            }) + "\n")
+
+
+def parse_dataframe(path):
+    rows = [
+        (
+            dataformat.get_interaction_user_id(record),
+            dataformat.get_interaction_item_id(record),
+            dataformat.get_interaction_timestamp(record),
+            dataformat.get_interaction_value(record),
+        )
+        for record in dataformat.datafile_reader(path)
+    ]
+    return pd.DataFrame(rows, columns=["USER_ID", "ITEM_ID", "TIMESTAMP", "EVENT_VALUE"])
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def traced(fn, *args, **kwargs):
+    """(result, runtime, peak traced memory) of fn(*args, **kwargs), timed and traced in separate runs"""
+    result, secs = timed(fn, *args, **kwargs)
+    tracemalloc.start()
+    fn(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, secs, peak
+
+
+def is_memory_mapped(arr):
+    while arr is not None:
+        if isinstance(arr, (np.memmap, mmap.mmap)):
+            return True
+        arr = getattr(arr, "base", None)
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "interactions.json.gz")
+        generate(path, args.rows)
+
+        parsed, parse_secs, parse_peak = traced(parse_dataframe, path)
+        _, build_secs = timed(columnar.load_interactions, path)
+        cached, reload_secs, reload_peak = traced(columnar.load_interactions, path)
+
+        for cn in ("USER_ID", "ITEM_ID"):
+            assert (cached[cn].astype(str).values == parsed[cn].values).all(), f"{cn} mismatch"
+        assert np.array_equal(cached["TIMESTAMP"].values, parsed["TIMESTAMP"].values), "TIMESTAMP mismatch"
+        assert np.array_equal(cached["EVENT_VALUE"].values, parsed["EVENT_VALUE"].values), "EVENT_VALUE mismatch"
+        for cn in cached:
+            values = cached[cn].values
+            assert is_memory_mapped(values.codes if cn in columnar.ID_FIELDS else values), f"{cn} not mapped"
+
+        print(f"\n{args.rows} interactions")
+        print("parse to DataFrame:  {:.2f}s, traced peak {:.0f}MB".format(parse_secs, parse_peak / 2**20))
+        print(f"columnar build:      {build_secs:.2f}s")
+        print("columnar reload:     {:.2f}s, traced peak {:.0f}MB ({:.0f}x faster)".format(
+            reload_secs, reload_peak / 2**20, parse_secs / reload_secs
+        ))
@@ -0,0 +1,90 @@
+"""Benchmark sequential vs process-parallel dataformat.data_folder_reader on a folder of part-files
+
+Generates a folder of gzipped JSON-lines and CSV interaction part-files, checks that ordered parallel
+reading yields exactly the sequential records, and reports throughput for each worker count. Also reports the
+CPU time of the consuming (main) process: the speedup can't exceed sequential time / consumer CPU time, however
+many cores, so this shows the scaling headroom even on machines with few cores e.g:
+
+    cd Personalize && python ../benchmarks/data_folder_reader.py --parts 24 --workers 1 2 4 8
+"""
+
+# Python Built-Ins:
+import argparse
+import csv
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Personalize"))
+from util import dataformat
+
+
+def generate(folder, n_parts, rows_per_part, seed=42):
+    rng = random.Random(seed)
+    for part in range(n_parts):
+        rows = [
+            {
+                "USER_ID": f"U{rng.randrange(10**6)}",
+                "ITEM_ID": f"I{rng.randrange(10**5)}",
+                "TIMESTAMP": 1500000000 + rng.randrange(10**7),
+                "EVENT_TYPE": rng.choice(["click", "purchase", "view"]),
+            }
+            for _ in range(rows_per_part)
+        ]
+        if part % 2:
+            with gzip.open(os.path.join(folder, f"part-{part:04d}.csv.gz"), "wt", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with gzip.open(os.path.join(folder, f"part-{part:04d}.json.gz"), "wt") as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+
+
+def timed(folder, **kwargs):
+    """(records, wall time, consumer process CPU time) of data_folder_reader"""
+    t0 = time.perf_counter()
+    cpu0 = time.process_time()
+    records = list(dataformat.data_folder_reader(folder, **kwargs))
+    return records, time.perf_counter() - t0, time.process_time() - cpu0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", type=int, default=24)
+    parser.add_argument("--rows-per-part", type=int, default=200000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        generate(folder, args.parts, args.rows_per_part)
+        results = []
+        baseline, baseline_secs, _ = timed(folder)
+        for n_workers in sorted(set(args.workers)):
+            for ordered in ((True, False) if n_workers > 1 else (True,)):
+                records, secs, cpu_secs = timed(folder, n_workers=n_workers, ordered=ordered)
+                if ordered:
+                    assert records == baseline, "Ordered parallel output differs from sequential"
+                else:
+                    assert len(records) == len(baseline), "Unordered parallel output lost records"
+                results.append((n_workers, ordered, secs, cpu_secs))
+
+        print(f"\n{os.cpu_count()} CPUs, {len(baseline)} records in {args.parts} files")
+        print(f"sequential: {baseline_secs:.2f}s ({len(baseline) / baseline_secs:,.0f} records/s)")
+        for n_workers, ordered, secs, cpu_secs in results:
+            print("n_workers={} ordered={}: {:.2f}s ({:,.0f} records/s, {:.2f}x), consumer CPU {:.2f}s "
+                  "(speedup ceiling {:.1f}x)".format(
+                n_workers,
+                ordered,
+                secs,
+                len(baseline) / secs,
+                baseline_secs / secs,
+                cpu_secs,
+                baseline_secs / cpu_secs,
+            ))
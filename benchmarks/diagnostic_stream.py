@@ -0,0 +1,131 @@
+"""Check diagnostic_stream.analyze_interactions_stream against the in-memory diagnostic.analyze_interactions
+
+Generates random interaction records (with some missing timestamps, duplicate events and repeated user-item
+pairs), runs both paths with plotting disabled, and checks the rates, activity patterns, category counts and
+(deterministic, non-bootstrap) temporal losses agree, reporting each path's runtime e.g:
+
+    cd Personalize && python ../benchmarks/diagnostic_stream.py --rows 300000 --chunk-size 50000
+"""
+
+# Python Built-Ins:
+import argparse
+import os
+import sys
+import time
+
+# External Dependencies:
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Personalize"))
+from util import diagnostic, diagnostic_stream
+
+
+def generate(n_rows, n_users, n_items, seed=42):
+    rng = np.random.default_rng(seed)
+    users = rng.zipf(1.5, n_rows) % n_users
+    items = rng.zipf(1.3, n_rows) % n_items
+    timestamps = 1500000000 + rng.integers(0, 3600 * 24 * 90, n_rows)
+    # Repeat some events exactly, and some user-item pairs at a later time:
+    dup = rng.random(n_rows) < 0.05
+    timestamps[1:][dup[1:]] = timestamps[:-1][dup[1:]]
+    users[1:][dup[1:]] = users[:-1][dup[1:]]
+    items[1:][dup[1:]] = items[:-1][dup[1:]]
+    missing = rng.random(n_rows) < 0.01
+    return [
+        {
+            "USER_ID": f"U{u}",
+            "ITEM_ID": f"I{i}|C{i % 7}" if i % 13 == 0 else f"I{i}",
+            "TIMESTAMP": None if m else int(t),
+        }
+        for u, i, t, m in zip(users, items, timestamps, missing)
+    ]
+
+
+def record_calls(names):
+    """Patch diagnostic functions to record their calls, returning {name: [(args, result), ...]}"""
+    calls = {name: [] for name in names}
+    for name in names:
+        fn = getattr(diagnostic, name)
+        fn = getattr(fn, "__wrapped__", fn)
+        def recorder(*args, _fn=fn, _calls=calls[name], **kwargs):
+            result = _fn(*args, **kwargs)
+            _calls.append((args + tuple(kwargs.values()), result))
+            return result
+        recorder.__wrapped__ = fn
+        setattr(diagnostic, name, recorder)
+    return calls
+
+
+def temporal_losses(item_counts):
+    return {
+        (freq, method, hist_len): diagnostic.compute_temporal_loss(None, freq, method, hist_len, counts)[2]
+        for freq, counts in item_counts.items()
+        for method in diagnostic.TEMPORAL_LOSS_METHODS
+        for hist_len in [1] + (diagnostic.ROLLING_HISTORY_LEN if freq in diagnostic.TEMPORAL_FREQUENCY else [])
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--partitions", type=int, default=8)
+    parser.add_argument(
+        "--retrain-freqs", nargs="+", default=None,
+        help="Override diagnostic.RETRAIN_FREQUENCY (e.g. for pandas versions without the default aliases)")
+    args = parser.parse_args()
+    if args.retrain_freqs:
+        diagnostic.RETRAIN_FREQUENCY = args.retrain_freqs
+    diagnostic.pl.show = lambda *args, **kwargs: diagnostic.pl.close("all")
+
+    records = generate(args.rows, args.users, args.items)
+    names = [
+        "check_missing_rate", "check_duplication_rate", "check_repeat_rate",
+        "describe_category_counts", "analyze_activity_patterns", "compute_item_counts",
+    ]
+
+    calls = record_calls(names)
+    t0 = time.perf_counter()
+    diagnostic.analyze_interactions(pd.DataFrame(records))
+    secs_memory = time.perf_counter() - t0
+    expected = calls
+    item_counts = {args[1]: result for args, result in expected["compute_item_counts"]}
+
+    calls = record_calls(names)
+    t0 = time.perf_counter()
+    stats = diagnostic_stream.analyze_interactions_stream(
+        iter(records), chunk_size=args.chunk_size, n_partitions=args.partitions)
+    secs_stream = time.perf_counter() - t0
+
+    for name in ["check_missing_rate", "check_duplication_rate", "check_repeat_rate"]:
+        assert np.isclose(calls[name][0][0][0], expected[name][0][0][0]), name
+    for got, want in zip(calls["analyze_activity_patterns"][0][0], expected["analyze_activity_patterns"][0][0]):
+        assert list(got.index) == list(want.index) and (got.values == want.values).all(), "activity patterns"
+    cats = {cat_args[1]: (cat_args, result) for cat_args, result in calls["describe_category_counts"]}
+    for (cats_freq, name), result in expected["describe_category_counts"]:
+        if name in cats:
+            cat_args, got = cats[name]
+            assert (cat_args[0].values == cats_freq.values).all(), name
+            head = cat_args[2] if len(cat_args) > 2 else cat_args[0]
+            assert (head.head(10).values == cats_freq.head(10).values).all(), name
+            assert np.allclose(got, result), name
+    assert sorted(cats) == ["ITEM_ID", "USER_ID"]
+
+    for freq, counts in stats["item_counts"].items():
+        want = item_counts[freq]
+        assert (counts["index"] == want["index"]).all(), freq
+        assert (counts["df_wgt"].values == want["df_wgt"].values).all(), freq
+    got_losses = temporal_losses(stats["item_counts"])
+    want_losses = temporal_losses(item_counts)
+    for key, loss in want_losses.items():
+        assert np.isclose(got_losses[key], loss, rtol=0, atol=1e-12), key
+
+    print(f"\n{args.rows} rows, {args.chunk_size} per chunk, {args.partitions} partitions: results match")
+    print(f"in-memory: {secs_memory:.2f}s")
+    print(f"stream: {secs_stream:.2f}s")
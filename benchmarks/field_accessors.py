@@ -0,0 +1,65 @@
+"""Micro-benchmark the dataformat get_* getter chains vs schema-compiled extractors
+
+For a few typical record schemas, checks that dataformat.detect_extractor() returns exactly the getters'
+values and reports the time per record of each e.g:
+
+    cd Personalize && python ../benchmarks/field_accessors.py --records 200000
+"""
+
+# Python Built-Ins:
+import argparse
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Personalize"))
+from util import dataformat
+
+SCHEMAS = {
+    # Amazon review data: every field matches the first candidate key
+    "amazon-reviews": lambda i, rng: {
+        "reviewerID": f"A{rng.randrange(10**6)}",
+        "asin": f"B{rng.randrange(10**5)}",
+        "unixReviewTime": 1500000000 + i,
+        "overall": float(rng.randint(1, 5)),
+        "reviewText": "Lorem ipsum",
+    },
+    # Personalize-style CSV rows: string values, keys late in the chains, no event value
+    "personalize-csv": lambda i, rng: {
+        "USER_ID": f"U{rng.randrange(10**6)}",
+        "ITEM_ID": f"I{rng.randrange(10**5)}",
+        "TIMESTAMP": str(1500000000 + i),
+        "EVENT_TYPE": "click",
+    },
+}
+
+
+def generic_extract(record):
+    return tuple([getter(record) for _, getter, _ in dataformat.INTERACTION_FIELDS.values()])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    for name, make_record in SCHEMAS.items():
+        records = [make_record(i, rng) for i in range(args.records)]
+        extract, _ = dataformat.detect_extractor(records)
+        assert repr([extract(r) for r in records]) == repr([generic_extract(r) for r in records]), \
+            f"{name}: compiled extractor output differs from getters"
+
+        def best_secs(fn):
+            return min(timeit.repeat(lambda: [fn(r) for r in records], number=1, repeat=args.repeat))
+        getter_secs = best_secs(generic_extract)
+        compiled_secs = best_secs(extract)
+        print("{}: getters {:.0f}ns/record, compiled {:.0f}ns/record ({:.1f}x)".format(
+            name,
+            getter_secs / args.records * 1e9,
+            compiled_secs / args.records * 1e9,
+            getter_secs / compiled_secs,
+        ))
@@ -0,0 +1,111 @@
+"""Benchmark (and check equivalence of) diagnostic's ID interning vs the previous str-based rate computations
+
+Builds a synthetic interactions table plus users and items tables, and computes the duplication, repeat,
+missing meta-data and cold-start rates both the previous way (astype(str), groupby/drop_duplicates over the
+object columns, set membership) and from factorize_ids codes with combined int64 keys, reporting the runtime
+and traced peak memory of each e.g:
+
+    cd Personalize && python ../benchmarks/id_interning.py --rows 10000000
+"""
+
+# Python Built-Ins:
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+# External Dependencies:
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Personalize"))
+from util import diagnostic
+
+
+def generate(n_rows, n_users, n_items, seed=42):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "USER_ID": rng.integers(0, n_users, n_rows),
+        "ITEM_ID": rng.zipf(1.3, n_rows) % n_items,
+        "TIMESTAMP": 1500000000 + rng.integers(0, 3600 * 24 * 90, n_rows),
+    })
+    # Repeat some events exactly:
+    dup = np.flatnonzero(rng.random(n_rows - 1) < 0.02) + 1
+    df.iloc[dup] = df.iloc[dup - 1].values
+    users = pd.DataFrame({"USER_ID": np.arange(0, int(n_users * 1.1), 2)})
+    items = pd.DataFrame({"ITEM_ID": np.arange(0, int(n_items * 1.1), 3)})
+    return df, users, items
+
+
+def rates_str(df, users, items):
+    """The previous implementation, for reference"""
+    df = df.copy()
+    df["ITEM_ID"] = df["ITEM_ID"].astype(str)
+    df["USER_ID"] = df["USER_ID"].astype(str)
+    dup_rate = (df.groupby(diagnostic.INTERACTIONS_REQUIRED_FIELDS).size() - 1.0).sum() / df.shape[0]
+    df = df.drop_duplicates(subset=diagnostic.INTERACTIONS_REQUIRED_FIELDS)
+    repeat_rate = (df.groupby(["USER_ID", "ITEM_ID"]).size() - 1.0).sum() / df.shape[0]
+    rates = [dup_rate, repeat_rate]
+    for field, meta in (("USER_ID", users), ("ITEM_ID", items)):
+        meta_ids = meta[field].astype(str)
+        rates.append(1 - df[field].isin(set(meta_ids.values)).mean())
+        rates.append(1 - meta_ids.isin(set(df[field].values)).mean())
+    return rates
+
+
+def rates_codes(df, users, items):
+    df = df.copy()
+    df["ITEM_ID"] = diagnostic.factorize_ids(df["ITEM_ID"])
+    df["USER_ID"] = diagnostic.factorize_ids(df["USER_ID"])
+    pair_key = diagnostic._combined_key(df["USER_ID"].cat.codes.values, df["ITEM_ID"].cat.codes.values)
+    event_key = diagnostic._combined_key(pair_key, pd.factorize(df["TIMESTAMP"])[0])
+    is_dup = pd.Index(event_key).duplicated()
+    dup_rate = is_dup.sum() / df.shape[0]
+    df = df[~is_dup]
+    pair_key = pair_key[~is_dup]
+    repeat_rate = pd.Index(pair_key).duplicated().sum() / df.shape[0]
+    rates = [dup_rate, repeat_rate]
+    for field, meta in (("USER_ID", users), ("ITEM_ID", items)):
+        df_ids = df[field].values
+        meta_codes = diagnostic.factorize_ids(meta[field], categories=df_ids.categories).codes
+        n_ids = len(df_ids.categories)
+        rates.append(1 - diagnostic._code_isin(df_ids.codes, meta_codes, n_ids).mean())
+        rates.append(1 - diagnostic._code_isin(meta_codes, df_ids.codes, n_ids).mean())
+    return rates
+
+
+def measure(fn, *args):
+    """(result, runtime, peak traced memory) of fn(*args), timed and traced in separate runs"""
+    t0 = time.perf_counter()
+    result = fn(*args)
+    secs = time.perf_counter() - t0
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, secs, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--items", type=int, default=100000)
+    args = parser.parse_args()
+
+    df, users, items = generate(args.rows, args.users, args.items)
+    results = {}
+    for name, fn in (("str", rates_str), ("codes", rates_codes)):
+        results[name] = measure(fn, df, users, items)
+    assert np.allclose(results["str"][0], results["codes"][0], rtol=0, atol=1e-12), "Rates differ"
+
+    ids = df[["USER_ID", "ITEM_ID"]]
+    str_bytes = ids.astype(str).memory_usage(deep=True, index=False).sum()
+    code_bytes = sum(diagnostic.factorize_ids(ids[field]).memory_usage(deep=True) for field in ids)
+    print(f"\n{args.rows} rows, {args.users} users, {args.items} items")
+    print("dup/repeat/missing/coldstart rates:", ", ".join(f"{r:.4f}" for r in results["codes"][0]))
+    print(f"ID columns: {str_bytes / 2**20:,.0f} MiB as str, {code_bytes / 2**20:,.0f} MiB as codes")
+    for name, (_, secs, peak) in results.items():
+        print(f"{name}: {secs:.2f}s, traced peak {peak / 2**20:,.0f} MiB")
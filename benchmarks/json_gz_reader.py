@@ -0,0 +1,90 @@
+"""Benchmark dataformat.json_gz_reader against the previous (str-splitting, per-line json.loads) version
+
+Generates a gzipped JSON-lines file of UCSD-review-like records (a few hundred MB uncompressed by default,
+with some very long lines), checks every implementation yields identical records, and reports throughput:
+
+    cd Personalize && python ../benchmarks/json_gz_reader.py --mb 300
+"""
+
+# Python Built-Ins:
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Personalize"))
+from util import dataformat
+
+
+def legacy_json_gz_reader(file, encoding="utf-8"):
+    """The original implementation, for reference"""
+    with open(file, "rb") as f:
+        dec = zlib.decompressobj(wbits=32 + zlib.MAX_WBITS)
+        pending = ""
+        for chunk in f:
+            raw = dec.decompress(chunk)
+            if raw:
+                lines = (pending + raw.decode(encoding)).split("\n")
+                pending = lines.pop()
+                for line in lines:
+                    yield json.loads(line)
+        if pending:
+            yield json.loads(pending)
+
+
+def generate(path, target_mb, seed=42):
+    rng = random.Random(seed)
+    words = ["great", "product", "works", "as", "expected", "would", "buy", "again", "not", "worth", "it"]
+    written = 0
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=1) as f:
+        i = 0
+        while written < target_mb * 1024 * 1024:
+            # Mostly short reviews, with the occasional very long one:
+            n_words = rng.randint(5, 80) if rng.random() > 0.001 else rng.randint(100000, 300000)
+            line = json.dumps({
+                "reviewerID": f"A{rng.randrange(10**8):08d}",
+                "asin": f"B{rng.randrange(10**6):09d}",
+                "reviewerName": "Some Reviewer",
+                "helpful": [rng.randint(0, 5), rng.randint(0, 10)],
+                "reviewText": " ".join(rng.choice(words) for _ in range(n_words)),
+                "overall": float(rng.randint(1, 5)),
+                "summary": "Üñíçødé summary",
+                "unixReviewTime": 1300000000 + rng.randrange(10**8),
+            }) + "\n"
+            f.write(line)
+            written += len(line)
+            i += 1
+    return i
+
+
+def run(name, reader, path):
+    t0 = time.perf_counter()
+    records = list(reader(path))
+    elapsed = time.perf_counter() - t0
+    mb = os.path.getsize(path) / 1024 / 1024
+    print(f"{name:>28}: {elapsed:6.2f}s ({len(records) / elapsed:,.0f} records/s, {mb / elapsed:.1f} MB/s gz)")
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=300, help="Uncompressed size of the generated file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "reviews.json.gz")
+        n = generate(path, args.mb)
+        print(f"Generated {n} records, {os.path.getsize(path) / 1024 / 1024:.0f}MB gzipped")
+
+        baseline = run("legacy", legacy_json_gz_reader, path)
+        candidates = [("new (json)", lambda p: dataformat.json_gz_reader(p, json_loads=json.loads))]
+        if dataformat.orjson is not None:
+            candidates.append(("new (orjson)", lambda p: dataformat.json_gz_reader(p)))
+        for name, reader in candidates:
+            assert run(name, reader, path) == baseline, f"{name} output differs from legacy"
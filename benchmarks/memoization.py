@@ -0,0 +1,88 @@
+"""Benchmark (and check equivalence of) diagnostic.analyze with its results memoized in a cache folder
+
+Builds a synthetic interactions table plus users and items tables, then runs the full analysis without a
+cache, with an empty cache and again with the filled cache, checking all three print the same report (up to
+the printed timings and the filled cache's memo.CACHED_NOTE lines) and reporting each runtime e.g:
+
+    cd Personalize && python ../benchmarks/memoization.py --rows 2000000
+"""
+
+# Python Built-Ins:
+import argparse
+import contextlib
+import io
+import os
+import re
+import sys
+import tempfile
+import time
+
+# External Dependencies:
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Personalize"))
+from util import diagnostic, memo
+
+
+def generate(n_rows, n_users, n_items, seed=42):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "USER_ID": np.array([f"U{u}" for u in rng.zipf(1.5, n_rows) % n_users], dtype=object),
+        "ITEM_ID": rng.zipf(1.3, n_rows) % n_items,
+        "TIMESTAMP": 1500000000 + rng.integers(0, 3600 * 24 * 365, n_rows),
+        "EVENT_TYPE": rng.choice(["click", "purchase"], n_rows),
+    })
+    users = pd.DataFrame({
+        "USER_ID": [f"U{u}" for u in range(0, n_users, 2)],
+        "AGE": rng.integers(10, 80, len(range(0, n_users, 2))),
+    })
+    items = pd.DataFrame({
+        "ITEM_ID": np.arange(0, n_items, 3),
+        "GENRE": rng.choice(["comedy|drama", "drama", "action", "action|comedy"], len(range(0, n_items, 3))),
+        "CREATION_TIMESTAMP": 1500000000 + rng.integers(0, 3600 * 24 * 365, len(range(0, n_items, 3))),
+    })
+    return df, users, items
+
+
+def run(df, users, items, **kwargs):
+    """(printed report without timings or cached notes, runtime) of diagnostic.analyze, with the same bootstrap"""
+    np.random.seed(0)
+    printed = io.StringIO()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(printed):
+        diagnostic.analyze(df, users, items, **kwargs)
+    secs = time.perf_counter() - t0
+    cached_note = re.escape(memo.CACHED_NOTE).replace(r"\{\}", ".*")
+    report = re.sub(cached_note + "\n", "", printed.getvalue())
+    return re.sub(r"time=[\d.]+s", "", report), secs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument(
+        "--retrain-freqs", nargs="+", default=None,
+        help="Override diagnostic.RETRAIN_FREQUENCY (e.g. for pandas versions without the default aliases)")
+    args = parser.parse_args()
+    if args.retrain_freqs:
+        diagnostic.RETRAIN_FREQUENCY = args.retrain_freqs
+    diagnostic.pl.show = lambda *args, **kwargs: diagnostic.pl.close("all")
+
+    df, users, items = generate(args.rows, args.users, args.items)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        expected, uncached_secs = run(df, users, items)
+        cold, cold_secs = run(df, users, items, cache_dir=cache_dir)
+        warm, warm_secs = run(df, users, items, cache_dir=cache_dir)
+        assert cold == expected and warm == expected, "Reports differ"
+        cache_bytes = sum(entry.stat().st_size for entry in os.scandir(cache_dir))
+
+    print(f"\n{args.rows} rows, {args.users} users, {args.items} items")
+    print(f"no cache: {uncached_secs:.2f}s")
+    print(f"empty cache: {cold_secs:.2f}s")
+    print(f"filled cache: {warm_secs:.2f}s ({uncached_secs / warm_secs:.1f}x), {cache_bytes / 2**20:,.1f} MiB cached")
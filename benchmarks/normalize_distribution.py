@@ -0,0 +1,73 @@
+"""Benchmark (and check equivalence of) diagnostic._normalize_distribution vs the previous per-row version
+
+Builds a random sparse time-bucket x item count matrix like compute_distribution_shift's inputs, and checks
+the vectorized normalization matches the old np.split/np.hstack implementation exactly e.g:
+
+    cd Personalize && python ../benchmarks/normalize_distribution.py --rows 5000 --cols 1000000
+"""
+
+# Python Built-Ins:
+import argparse
+import os
+import sys
+import timeit
+
+# External Dependencies:
+import numpy as np
+import scipy.sparse as ss
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Personalize"))
+from util import diagnostic
+
+
+def normalize_distribution_per_row(X, jitter=1e-20):
+    """The previous implementation, for reference"""
+    sums = np.ravel(X.sum(axis=1))
+    rows = np.split(X.data, X.indptr[1:-1])
+    X_data = np.hstack([
+        x/(s+jitter) for s,x in
+        zip(sums, rows)
+    ])
+    return ss.csr_matrix(
+        (X_data, X.indices, X.indptr),
+        shape=X.shape)
+
+
+def random_counts(n_rows, n_cols, density, seed=42):
+    rng = np.random.default_rng(seed)
+    X = ss.random(n_rows, n_cols, density=density, format="csr", random_state=rng,
+                  data_rvs=lambda n: rng.integers(1, 100, n))
+    # Include some empty rows (time buckets with no activity):
+    keep_rows = np.ones(n_rows, dtype=np.int64)
+    keep_rows[rng.choice(n_rows, n_rows // 10, replace=False)] = 0
+    X = (ss.diags(keep_rows, dtype=np.int64) @ X.astype(np.int64)).tocsr()
+    X.eliminate_zeros()
+    return X
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--cols", type=int, default=200000)
+    parser.add_argument("--density", type=float, default=0.001)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    X = random_counts(args.rows, args.cols, args.density)
+    for inplace in (False, True):
+        X_in = X.astype(np.float64) if inplace else X
+        expected = normalize_distribution_per_row(X_in)
+        result = diagnostic._normalize_distribution(X_in, inplace=inplace)
+        assert np.array_equal(result.indptr, expected.indptr), "indptr differs"
+        assert np.array_equal(result.indices, expected.indices), "indices differ"
+        assert np.array_equal(result.data, expected.data), f"inplace={inplace} output differs from per-row"
+    assert np.array_equal(X.data, random_counts(args.rows, args.cols, args.density).data), "Input modified"
+
+    per_row_secs = min(timeit.repeat(lambda: normalize_distribution_per_row(X), number=1, repeat=args.repeat))
+    vectorized_secs = min(timeit.repeat(
+        lambda: diagnostic._normalize_distribution(X), number=1, repeat=args.repeat
+    ))
+    print(f"\n{args.rows} x {args.cols} matrix, {X.nnz} non-zeros: outputs identical")
+    print(f"per-row:    {per_row_secs * 1000:.1f}ms")
+    print(f"vectorized: {vectorized_secs * 1000:.1f}ms ({per_row_secs / vectorized_secs:.1f}x)")
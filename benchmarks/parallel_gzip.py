@@ -0,0 +1,83 @@
+"""Benchmark single-stream gzip compression vs dataformat.ParallelGzipWriter
+
+Compresses synthetic JSON-lines item metadata written one record at a time (as preproc.remove_unused_items
+does), checks the multi-member output decompresses to the same data, and reports throughput and size e.g:
+
+    cd Personalize && python ../benchmarks/parallel_gzip.py --records 500000 --workers 1 2 4 8
+"""
+
+# Python Built-Ins:
+import argparse
+import gzip
+import io
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Personalize"))
+from util import dataformat
+
+
+def generate(n_records, seed=42):
+    rng = random.Random(seed)
+    words = ["book", "paperback", "edition", "novel", "guide", "history", "volume", "series", "collected"]
+    return [
+        ("\n" if i else "") + json.dumps({
+            "asin": f"B{i:09d}",
+            "title": " ".join(rng.choices(words, k=rng.randint(2, 8))),
+            "description": " ".join(rng.choices(words, k=rng.randint(10, 100))),
+            "price": round(rng.random() * 100, 2),
+            "salesRank": { "Books": rng.randrange(10**6) },
+        })
+        for i in range(n_records)
+    ]
+
+
+def single_stream(lines):
+    """The previous remove_unused_items approach: one compressobj, one compress() call per record"""
+    out = io.BytesIO()
+    cmp = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for line in lines:
+        out.write(cmp.compress(line.encode("utf-8")))
+    out.write(cmp.flush())
+    return out.getvalue()
+
+
+def parallel(lines, n_workers):
+    out = io.BytesIO()
+    writer = dataformat.ParallelGzipWriter(out, n_workers=n_workers)
+    with writer:
+        for line in lines:
+            writer.write(line.encode("utf-8"))
+    return out.getvalue()
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=500000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    args = parser.parse_args()
+
+    lines = generate(args.records)
+    raw_mb = sum(len(line) for line in lines) / 2**20
+    baseline, baseline_secs = timed(single_stream, lines)
+    expected = gzip.decompress(baseline)
+
+    print(f"\n{os.cpu_count()} CPUs, {args.records} records, {raw_mb:.0f}MB uncompressed")
+    print(f"single stream: {baseline_secs:.2f}s ({raw_mb / baseline_secs:.0f}MB/s), {len(baseline) / 2**20:.1f}MB")
+    for n_workers in sorted(set(args.workers)):
+        result, secs = timed(parallel, lines, n_workers)
+        assert gzip.decompress(result) == expected, "Parallel output differs from single stream"
+        print("n_workers={}: {:.2f}s ({:.0f}MB/s, {:.2f}x), {:.1f}MB".format(
+            n_workers, secs, raw_mb / secs, baseline_secs / secs, len(result) / 2**20
+        ))
@@ -0,0 +1,77 @@
+"""Compare end-to-end latency of the deployed Search and SearchRerank Lambda functions
+
+SearchRerank used to invoke the Search function synchronously, and now runs the search in-process. Run this
+against a stack deployed before and after that change (or compare SearchRerank against Search alone, which
+approximates the cost of the removed nested hop) e.g:
+
+    python benchmarks/search_latency.py --functions allstore-Search allstore-Rerank --user-id A1B2C3
+
+Reports client-observed round trip and Lambda-reported duration percentiles per function.
+"""
+
+# Python Built-Ins:
+import argparse
+import base64
+import json
+import re
+import time
+
+# External Dependencies:
+import boto3
+import numpy as np
+
+DEFAULT_QUERIES = ["book", "harry potter", "cookbok", "python", "lord of the rings", "kindle", "history"]
+REPORT_DURATION_EXP = re.compile(r"\tDuration: ([\d.]+) ms")
+
+
+def benchmark_function(lambdaclient, function_name, queries, user_id, repeats):
+    roundtrip_ms = []
+    duration_ms = []
+    for _ in range(repeats):
+        for q in queries:
+            event = { "queryStringParameters": { "q": q } }
+            if user_id:
+                event["queryStringParameters"]["u"] = user_id
+            t0 = time.perf_counter()
+            response = lambdaclient.invoke(
+                FunctionName=function_name,
+                LogType="Tail",
+                Payload=json.dumps(event),
+            )
+            response["Payload"].read()
+            roundtrip_ms.append((time.perf_counter() - t0) * 1000)
+            match = REPORT_DURATION_EXP.search(base64.b64decode(response["LogResult"]).decode("utf-8"))
+            if match:
+                duration_ms.append(float(match[1]))
+    return np.array(roundtrip_ms), np.array(duration_ms)
+
+
+def describe(name, values):
+    if not len(values):
+        return f"{name}: n/a"
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return f"{name}: p50={p50:.0f}ms p90={p90:.0f}ms p99={p99:.0f}ms (n={len(values)})"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--functions", nargs="+", required=True, help="Lambda function names/ARNs to compare")
+    parser.add_argument("--queries", nargs="+", default=DEFAULT_QUERIES)
+    parser.add_argument("--user-id", default=None, help="User ID for personalized re-ranking")
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    lambdaclient = boto3.client("lambda")
+    for function_name in args.functions:
+        # Warm up, so cold starts don't skew the comparison:
+        benchmark_function(lambdaclient, function_name, args.queries[:1], args.user_id, 1)
+        roundtrip, duration = benchmark_function(
+            lambdaclient,
+            function_name,
+            args.queries,
+            args.user_id,
+            args.repeats,
+        )
+        print(f"=== {function_name} ===")
+        print(describe("round trip", roundtrip))
+        print(describe("Lambda duration", duration))
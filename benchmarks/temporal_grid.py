@@ -0,0 +1,74 @@
+"""Benchmark (and check equivalence of) the process-parallel temporal shift grid vs computing it serially
+
+Builds random de-duplicated events, computes every analyze_temporal_shift loss serially and with
+diagnostic.compute_temporal_grid for each worker count, and checks the losses match exactly e.g:
+
+    cd Personalize && python ../benchmarks/temporal_grid.py --rows 2000000 --workers 2 4 8
+"""
+
+# Python Built-Ins:
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+# External Dependencies:
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Personalize"))
+from util import diagnostic
+
+
+def serial_grid(df, bs_mask, item_codes):
+    grid = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for freq in dict.fromkeys(diagnostic.RETRAIN_FREQUENCY + diagnostic.TEMPORAL_FREQUENCY):
+            counts = diagnostic.compute_item_counts(
+                df, freq, bs_mask, item_codes, diagnostic._temporal_hist_lens(freq))
+            grid[freq] = {}
+            for method in diagnostic.TEMPORAL_LOSS_METHODS:
+                grid[freq][(method, 0)] = diagnostic.compute_bootstrap_loss(df, freq, method, counts)
+                for hist_len in diagnostic._temporal_hist_lens(freq):
+                    grid[freq][(method, hist_len)] = diagnostic.compute_temporal_loss(
+                        df, freq, method, hist_len, counts)
+    return grid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count()])
+    parser.add_argument(
+        "--retrain-freqs", nargs="+", default=None,
+        help="Override diagnostic.RETRAIN_FREQUENCY (e.g. for pandas versions without the default aliases)")
+    args = parser.parse_args()
+    if args.retrain_freqs:
+        diagnostic.RETRAIN_FREQUENCY = args.retrain_freqs
+
+    rng = np.random.default_rng(42)
+    times = np.sort(1500000000 + rng.integers(0, 3600 * 24 * 365, args.rows)).astype("datetime64[s]")
+    df = pd.DataFrame(index=pd.DatetimeIndex(times))
+    bs_mask = rng.random(args.rows) < 0.5
+    item_codes = pd.factorize(rng.zipf(1.3, args.rows) % args.items)[0]
+
+    t0 = time.perf_counter()
+    expected = serial_grid(df, bs_mask, item_codes)
+    serial_secs = time.perf_counter() - t0
+    print(f"\n{os.cpu_count()} CPUs, {args.rows} events")
+    print(f"serial: {serial_secs:.2f}s")
+    for n_workers in sorted(set(args.workers)):
+        t0 = time.perf_counter()
+        grid = diagnostic.compute_temporal_grid(times, bs_mask, item_codes, n_workers)
+        secs = time.perf_counter() - t0
+        assert list(grid) == list(expected), "Frequencies out of order"
+        for freq, cells in expected.items():
+            assert list(grid[freq]) == list(cells), "Cells out of order"
+            for key, (loss, df_wgt, avg_loss, loss_fmt) in cells.items():
+                (got_loss, got_wgt, got_avg, got_fmt), _ = grid[freq][key]
+                assert got_loss.equals(loss) and got_wgt.equals(df_wgt) and got_avg == avg_loss, (freq, key)
+        print(f"n_workers={n_workers}: {secs:.2f}s ({serial_secs / secs:.2f}x)")
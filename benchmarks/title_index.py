@@ -0,0 +1,118 @@
+"""Benchmark the local fuzzy title index against an independent model of the ES fuzzy title query
+
+For a seeded sample of catalog title terms, with and without random typos, compares the top-25 results of
+TitleIndex.search() with the set of items the Search Lambda's ES `fuzzy` query would match, and reports
+recall and latency. The reference re-implements Lucene's FuzzyQuery rules separately from itemstore.titleindex
+(sharing only the index's term vocabulary and postings): fuzziness AUTO (0 edits for terms of 1-2 characters,
+1 for 3-5, 2 otherwise), transpositions counted as one edit, prefix_length 0, and the max_expansions=50 terms
+kept by Lucene's similarity 1 - edits / min(query length, term length), ties to the smaller term. This differs
+from the index, which keeps the closest terms by plain edit distance, so recall can dip below 1 for queries
+with more than 50 expansions. Tokenization differences with the ES standard analyzer are not modelled e.g:
+
+    python functions/layers/build_title_index.py
+    python benchmarks/title_index.py
+"""
+
+# Python Built-Ins:
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+# External Dependencies:
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "functions", "layers", "ItemStoreCommon"))
+from itemstore.titleindex import TitleIndex
+
+DEFAULT_INDEX = os.path.join(ROOT, "functions", "layers", "ItemStoreCommon", "itemstore", "data", "title_index.json.gz")
+# The Search Lambda's fuzzy query parameters (ES defaults):
+ES_AUTO_LOW, ES_AUTO_HIGH = 3, 6
+ES_PREFIX_LENGTH = 0
+ES_MAX_EXPANSIONS = 50
+
+
+def add_typo(term, rng):
+    """Apply one random substitution, insertion, deletion or transposition"""
+    i = rng.randrange(len(term))
+    op = rng.choice(["sub", "ins", "del", "swap"])
+    c = rng.choice(string.ascii_lowercase)
+    if op == "sub":
+        return term[:i] + c + term[i + 1:]
+    elif op == "ins":
+        return term[:i] + c + term[i:]
+    elif op == "del" and len(term) > 1:
+        return term[:i] + term[i + 1:]
+    elif i < len(term) - 1:
+        return term[:i] + term[i + 1] + term[i] + term[i + 2:]
+    return term
+
+
+def osa_distance(a, b):
+    """Full optimal string alignment distance (as Lucene's LevenshteinAutomata with transpositions)"""
+    d = [[i + j if i == 0 or j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+
+def es_matches(index, q):
+    """Brute-force the set of doc indices an ES fuzzy (AUTO, constant_score) title query would match"""
+    max_edits = 0 if len(q) < ES_AUTO_LOW else 1 if len(q) < ES_AUTO_HIGH else 2
+    prefix = q[:ES_PREFIX_LENGTH]
+    candidates = []
+    for term_id, term in enumerate(index.terms):
+        if abs(len(term) - len(q)) > max_edits or not term.startswith(prefix):
+            continue
+        edits = osa_distance(q, term)
+        if edits <= max_edits:
+            similarity = 1 - edits / max(1, min(len(q), len(term)))
+            candidates.append((-similarity, term, term_id))
+    candidates.sort()
+    return set(ix for _, _, term_id in candidates[:ES_MAX_EXPANSIONS] for ix in index.postings[term_id])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", default=DEFAULT_INDEX)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--size", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=1337)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    index = TitleIndex.load(args.index)
+    print(f"Loaded {len(index.docs)} docs / {len(index.terms)} terms in {time.perf_counter() - t0:.2f}s")
+    asin_to_ix = { doc["asin"]: ix for ix, doc in enumerate(index.docs) }
+
+    rng = random.Random(args.seed)
+    # Sample queries from the term vocabulary weighted by document frequency, like real head queries:
+    weights = [len(p) for p in index.postings]
+    terms = [t for t in rng.choices(index.terms, weights=weights, k=args.queries * 3) if len(t) >= 3]
+    for typos in (False, True):
+        latencies = []
+        recalls = []
+        for term in terms[:args.queries]:
+            q = add_typo(term, rng) if typos else term
+            t0 = time.perf_counter()
+            results = index.search(q, size=args.size)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            truth = es_matches(index, q)
+            if truth:
+                found = set(asin_to_ix[doc["asin"]] for doc in results)
+                recalls.append(len(found & truth) / min(args.size, len(truth)))
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print("{}: top-{} recall vs ES fuzzy model={:.3f}, latency p50={:.2f}ms p99={:.2f}ms (n={})".format(
+            "typo queries" if typos else "exact queries",
+            args.size,
+            np.mean(recalls),
+            p50,
+            p99,
+            len(latencies),
+        ))
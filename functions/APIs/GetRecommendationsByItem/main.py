@@ -6,6 +6,9 @@ import os
 # External Dependencies:
 import boto3
 
+# Local Dependencies (ItemStoreCommon layer):
+from itemstore.hydration import hydrate_items
+
 dynamodb = boto3.resource("dynamodb")
 personalize_runtime = boto3.client("personalize-runtime")
 table = dynamodb.Table(os.environ["DDB_TABLE_NAME"])
@@ -25,18 +28,11 @@ def handler(event, context):
             itemId = itemId,
         )
 
-        itemlist = []
-        errcount = 0
-        for item in recs["itemList"]:
-            itemobj = table.get_item(Key={ "asin": item["itemId"] })
-            try:
-                itemlist.append(itemobj["Item"])
-            except:
-                errcount += 1
+        itemlist, missing = hydrate_items(dynamodb, table.name, [item["itemId"] for item in recs["itemList"]])
         response["results"] = itemlist
-        if errcount:
-            response["warning"] = f"{errcount} item IDs missing from DynamoDB"
-            logger.warning(response["warning"])
+        if missing:
+            response["warning"] = f"{len(missing)} item IDs missing from DynamoDB"
+            logger.warning(f"{response['warning']}: {missing}")
     else:
         response["results"] = []
         response["warning"] = (
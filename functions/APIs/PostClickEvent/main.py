@@ -1,5 +1,6 @@
 # Python Built-Ins:
 import base64
+from collections import OrderedDict
 import json
 import os
 import time
@@ -10,49 +11,83 @@ import boto3
 
 personalize_events = boto3.client(service_name="personalize-events")
 
+# PutEvents accepts at most 10 events per call:
+MAX_EVENTS_PER_CALL = 10
+
 def handler(event, context):
-    for record in event['Records']:
-        # Kinesis data is base64 encoded so decode here
-        payload = base64.b64decode(record['kinesis']['data'])
-        clickEvent = json.loads (payload)
-        print ('clickEvent: ',clickEvent)
-        send_clickEvent(clickEvent)
-        print ("Post Event to Personalize Successfully")
+    """Forward a whole Kinesis batch of click events to Personalize
+
+    Returns Kinesis partial batch failures, so only records belonging to failed PutEvents calls are
+    retried (requires ReportBatchItemFailures on the event source mapping).
+    """
+    sessions = group_clickEvents(event["Records"])
+
+    failed = []
+    n_sent = 0
+    for (userID, session_ID), events in sessions.items():
+        for ix in range(0, len(events), MAX_EVENTS_PER_CALL):
+            chunk = events[ix:ix + MAX_EVENTS_PER_CALL]
+            try:
+                send_clickEvents(userID, session_ID, [e for _, e in chunk])
+                n_sent += len(chunk)
+            except Exception as err:
+                print(f"Failed to put {len(chunk)} events for user {userID} session {session_ID}: {err}")
+                failed += [seq for seq, _ in chunk]
 
-        return "Post Event to Personalize Successfully"
+    print(f"Posted {n_sent} events to Personalize from {len(event['Records'])} records, {len(failed)} failed")
+    return {
+        "batchItemFailures": [{ "itemIdentifier": seq } for seq in failed],
+    }
 
 
-def send_clickEvent(clickEvent):
-    try:
-        userID = clickEvent['userID']
-    except:
-        userID = False
+def group_clickEvents(records):
+    """Decode Kinesis records into Personalize events grouped by (userID, sessionID)
 
-    if(userID):
+    Groups (and events within them) keep the order of the batch. Anonymous and undecodable records are
+    skipped, and events without a session ID share one generated session per user per batch.
+
+    Returns
+    -------
+    sessions : OrderedDict[Tuple[str, str], List[Tuple[str, dict]]]
+        Lists of (Kinesis sequence number, PutEvents event) by (userID, sessionID)
+    """
+    sessions = OrderedDict()
+    generated_sessions = {}
+    for record in records:
+        seq = record["kinesis"]["sequenceNumber"]
         try:
-            session_ID = clickEvent['sessionID']
-            if session_ID ==  None:
-                session_ID = str(uuid.uuid1())
-        except:
-            session_ID = str(uuid.uuid1())
-
-        event = {
-            "itemId": str(clickEvent['itemID']),
-        }
-        event_json = json.dumps(event)
-
-        print ("SID ",session_ID)
-
-        # Make Call
-        response = personalize_events.put_events(
-            trackingId = os.environ["TRACKING_ID"],
-            userId= userID,
-            sessionId = session_ID,
-            eventList = [{
-            'sentAt': int(time.time()),
-            'eventType': 'EVENT_TYPE',
-            'properties': event_json
-            }]
-        )
-    else :
-        print('no userID anonymous')
+            # Kinesis data is base64 encoded so decode here
+            clickEvent = json.loads(base64.b64decode(record["kinesis"]["data"]))
+            userID = clickEvent.get("userID")
+            itemID = clickEvent["itemID"]
+        except Exception as err:
+            # Retrying a malformed record would never succeed, so just drop it:
+            print(f"Skipping undecodable record {seq}: {err}")
+            continue
+
+        if not userID:
+            print("no userID anonymous")
+            continue
+
+        session_ID = clickEvent.get("sessionID")
+        if session_ID is None:
+            if userID not in generated_sessions:
+                generated_sessions[userID] = str(uuid.uuid1())
+            session_ID = generated_sessions[userID]
+
+        sessions.setdefault((userID, session_ID), []).append((seq, {
+            "sentAt": int(record["kinesis"].get("approximateArrivalTimestamp", time.time())),
+            "eventType": "EVENT_TYPE",
+            "properties": json.dumps({ "itemId": str(itemID) }),
+        }))
+    return sessions
+
+
+def send_clickEvents(userID, session_ID, eventList):
+    """Post up to MAX_EVENTS_PER_CALL events for one user session to Personalize"""
+    return personalize_events.put_events(
+        trackingId=os.environ["TRACKING_ID"],
+        userId=userID,
+        sessionId=session_ID,
+        eventList=eventList,
+    )
@@ -1,4 +1,5 @@
 # Python Built-Ins:
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
 import os
@@ -6,10 +7,16 @@ import os
 # External Dependencies:
 import boto3
 
+# Local Dependencies (ItemStoreCommon layer):
+from itemstore.hydration import hydrate_items
+from itemstore.search import DOC_FIELDS, search_documents
+
 dynamodb = boto3.resource("dynamodb")
-lambdafunction = boto3.client("lambda")
 personalize_runtime = boto3.client("personalize-runtime")
 table = dynamodb.Table(os.environ["DDB_TABLE_NAME"])
+# For hydrating search results while Personalize is ranking them. Only the worker thread touches the
+# DynamoDB resource (which isn't thread-safe) while a hydration is in flight:
+executor = ThreadPoolExecutor(max_workers=1)
 
 # (Slicing with None is equivalent to no limit)
 MAX_PROMOTED_RESULTS = os.environ.get("MAX_PROMOTED_RESULTS")
@@ -20,16 +27,25 @@ if MAX_PROMOTED_RESULTS is not None:
 logger = logging.getLogger()
 
 def handler(event, context):
-    sresult = lambdafunction.invoke(
-        FunctionName=os.environ["SEARCH_LAMBDA_ARN"],
-        LogType="Tail",
-        Payload=json.dumps(event),
-    )
-    res_json = json.loads(sresult["Payload"].read().decode("utf-8"))
-    raw_list = res_json["body"]["result"]
+    # Search in-process (rather than invoking the Search Lambda) to save a nested invocation:
+    _, raw_docs = search_documents(event["queryStringParameters"]["q"])
+    raw_list = [doc["asin"] for doc in raw_docs]
 
     logger.info(f"Raw search results: {raw_list}")
 
+    # Search already returns the item details we need, so only look up any documents that are missing
+    # fields. The final list is a permutation of raw_list, so start that straight away rather than waiting
+    # for the re-ranking:
+    items_by_id = {
+        doc["asin"]: doc for doc in raw_docs if all(field in doc for field in DOC_FIELDS)
+    }
+    hydration = executor.submit(
+        hydrate_items,
+        dynamodb,
+        table.name,
+        [id for id in raw_list if id not in items_by_id],
+    )
+
     campaign_arn = os.environ.get("CAMPAIGN_ARN")
     response = {}
     reranked_list = []
@@ -58,22 +74,21 @@ def handler(event, context):
     # We will return up to MAX_PROMOTED_RESULTS from the re-ranked list first, followed by results from the
     # raw list:
     promotions = reranked_list[:MAX_PROMOTED_RESULTS]
-    n_promotions = len(promotions)
     final_list = promotions + [id for id in raw_list if id not in promotions]
+    hydrated_items, missing = hydration.result()
+    items_by_id.update({ item["asin"]: item for item in hydrated_items })
     results = []
-    errcount = 0
-    for i, id in enumerate(final_list):
-        itemobj = table.get_item(Key={ "asin": id })
-        try:
-            results.append(itemobj["Item"])
-            if i < n_promotions:
-                itemobj["Item"]["Promoted"] = True
-        except:
-            errcount += 1
+    promoted_ids = set(promotions)
+    for id in final_list:
+        item = items_by_id.get(id)
+        if item is not None:
+            if id in promoted_ids:
+                item["Promoted"] = True
+            results.append(item)
 
-    if errcount:
-        missingWarning = f"{errcount} item IDs missing from DynamoDB"
-        logger.warning(missingWarning)
+    if missing:
+        missingWarning = f"{len(missing)} item IDs missing from DynamoDB"
+        logger.warning(f"{missingWarning}: {missing}")
         if "warning" in response:
             response["warning"] += "\n\n" + missingWarning
         else:
@@ -0,0 +1 @@
+"""Shared Python utilities for the item store Lambda functions (deployed as a Lambda layer)"""
@@ -0,0 +1,84 @@
+"""In-memory TTL + LRU cache for reuse across warm Lambda invocations
+
+Instances are intended to live at module level, so they survive between invocations of a warm container
+and are simply discarded with it. Not thread-safe beyond the atomicity of individual dict operations.
+"""
+
+# Python Built-Ins:
+from collections import OrderedDict
+import time
+from typing import Any, Hashable, Optional
+
+# Stored (and returned by get()) for keys known *not* to exist upstream:
+NEGATIVE = object()
+
+
+class TTLCache:
+    """Size-bounded LRU cache with per-entry expiry and optional negative caching
+
+    Parameters
+    ----------
+    max_entries :
+        Maximum number of entries held: the least recently used entry is evicted beyond this
+    ttl_secs :
+        Lifetime of a cached value
+    negative_ttl_secs : Optional
+        Lifetime of a cached NEGATIVE result (defaults to ttl_secs; 0 disables negative caching)
+    """
+    def __init__(self, max_entries: int, ttl_secs: float, negative_ttl_secs: Optional[float]=None):
+        self.max_entries = max_entries
+        self.ttl_secs = ttl_secs
+        self.negative_ttl_secs = ttl_secs if negative_ttl_secs is None else negative_ttl_secs
+        self._entries = OrderedDict()  # key -> (expiry, value)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any=None) -> Any:
+        """Return the cached value (possibly NEGATIVE) for key, or `default` if absent/expired"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                if entry[1] is NEGATIVE:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return entry[1]
+            del self._entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Cache `value` for `key` (pass NEGATIVE to record that the key doesn't exist)"""
+        ttl = self.negative_ttl_secs if value is NEGATIVE else self.ttl_secs
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop any cached value for `key`"""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def stats(self) -> str:
+        return "{} hits, {} negative hits, {} misses, {}/{} entries".format(
+            self.hits,
+            self.negative_hits,
+            self.misses,
+            len(self._entries),
+            self.max_entries,
+        )
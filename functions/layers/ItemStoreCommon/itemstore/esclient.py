@@ -0,0 +1,85 @@
+"""Reusable SigV4-signed HTTP client for the Amazon Elasticsearch Service domain
+
+Designed to be created once per container (at module level or lazily) so that warm invocations reuse
+pooled keep-alive connections, rather than paying for a new TCP+TLS handshake per request.
+"""
+
+# Python Built-Ins:
+from typing import Optional, Tuple, Union
+
+# External Dependencies:
+import boto3
+import requests
+from requests.adapters import HTTPAdapter
+from requests_aws4auth import AWS4Auth
+
+DEFAULT_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+
+
+class SignedESClient:
+    """requests.Session wrapper signing every request with current (auto-refreshed) AWS credentials
+
+    Credentials are re-read from botocore before each request: Refreshable credentials (e.g. from an
+    assumed role) are refreshed by botocore shortly before they expire, and the request signer is only
+    rebuilt when the credentials actually change.
+
+    Parameters
+    ----------
+    endpoint :
+        Domain endpoint host name, without https://
+    region :
+        AWS region of the domain
+    service : Optional
+        Service name to sign requests for
+    pool_maxsize : Optional
+        Maximum number of pooled connections to the domain
+    timeout : Optional
+        Default (connect, read) timeout in seconds for requests
+    boto_session : Optional
+        boto3 Session to source credentials from (defaults to a new default Session)
+    """
+    def __init__(
+        self,
+        endpoint: str,
+        region: str,
+        service: str="es",
+        pool_maxsize: int=10,
+        timeout: Union[float, Tuple[float, float]]=DEFAULT_TIMEOUT,
+        boto_session: Optional[boto3.Session]=None,
+    ):
+        self.base_url = f"https://{endpoint}"
+        self.region = region
+        self.service = service
+        self.timeout = timeout
+        self._credentials = (boto_session or boto3.Session()).get_credentials()
+        self._frozen = None
+        self._auth = None
+        self.session = requests.Session()
+        self.session.mount(
+            "https://",
+            HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=1),
+        )
+
+    def _get_auth(self) -> AWS4Auth:
+        frozen = self._credentials.get_frozen_credentials()
+        if frozen != self._frozen:
+            self._auth = AWS4Auth(
+                frozen.access_key,
+                frozen.secret_key,
+                self.region,
+                self.service,
+                session_token=frozen.token,
+            )
+            self._frozen = frozen
+        return self._auth
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send a signed request to `path` (relative to the domain root) via the pooled session"""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, self.base_url + path, auth=self._get_auth(), **kwargs)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
@@ -0,0 +1,153 @@
+"""Batched hydration of (ranked) item ID lists into full item records from DynamoDB
+
+Replaces one sequential GetItem per result with as few BatchGetItem round trips as possible, while keeping
+the order of the input ID list (e.g. a Personalize ranking).
+
+Item records (and IDs known to be missing) are cached in ITEM_CACHE for the life of the container, which
+can be tuned through environment variables:
+
+- ITEM_CACHE_MAX_ENTRIES (default 5000, 0 disables the cache)
+- ITEM_CACHE_TTL_SECS (default 300)
+- ITEM_CACHE_NEGATIVE_TTL_SECS (default 60, 0 disables negative caching)
+"""
+
+# Python Built-Ins:
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Local Dependencies:
+from .cache import NEGATIVE, TTLCache
+
+logger = logging.getLogger()
+
+# DynamoDB rejects BatchGetItem requests with more than 100 keys:
+MAX_BATCH_KEYS = 100
+MAX_RETRIES = 8
+BACKOFF_BASE_SECS = 0.05
+BACKOFF_MAX_SECS = 2.0
+
+ITEM_CACHE = TTLCache(
+    max_entries=int(os.environ.get("ITEM_CACHE_MAX_ENTRIES", 5000)),
+    ttl_secs=float(os.environ.get("ITEM_CACHE_TTL_SECS", 300)),
+    negative_ttl_secs=float(os.environ.get("ITEM_CACHE_NEGATIVE_TTL_SECS", 60)),
+)
+
+
+def _backoff_sleep(attempt: int) -> None:
+    """Sleep with capped exponential backoff and full jitter"""
+    time.sleep(random.uniform(0, min(BACKOFF_MAX_SECS, BACKOFF_BASE_SECS * 2 ** attempt)))
+
+
+def batch_get_items(
+    dynamodb,
+    table_name: str,
+    ids: Iterable[str],
+    key_name: str = "asin",
+) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """Fetch items by (string) key via BatchGetItem, retrying UnprocessedKeys with backoff
+
+    Parameters
+    ----------
+    dynamodb :
+        A boto3 DynamoDB *resource* (so returned items are already deserialized)
+    table_name :
+        Name of the DynamoDB table to read from
+    ids :
+        Item IDs to fetch (duplicates are fetched once)
+    key_name :
+        Name of the table's (string) partition key attribute
+
+    Returns
+    -------
+    items :
+        Dict of {id: item} for every ID found in the table
+    unprocessed :
+        IDs still unprocessed after MAX_RETRIES (so neither confirmed present nor absent)
+    """
+    unique_ids = list(dict.fromkeys(ids))
+    found = {}
+    unprocessed = []
+    for ix in range(0, len(unique_ids), MAX_BATCH_KEYS):
+        request = {
+            table_name: { "Keys": [{ key_name: id } for id in unique_ids[ix:ix + MAX_BATCH_KEYS]] },
+        }
+        attempt = 0
+        while request:
+            result = dynamodb.batch_get_item(RequestItems=request)
+            for item in result["Responses"].get(table_name, []):
+                found[item[key_name]] = item
+            request = result.get("UnprocessedKeys")
+            if request:
+                if attempt >= MAX_RETRIES:
+                    logger.warning(
+                        "Giving up on {} unprocessed keys after {} retries".format(
+                            len(request[table_name]["Keys"]),
+                            MAX_RETRIES,
+                        )
+                    )
+                    unprocessed += [key[key_name] for key in request[table_name]["Keys"]]
+                    break
+                _backoff_sleep(attempt)
+                attempt += 1
+    return found, unprocessed
+
+
+def hydrate_items(
+    dynamodb,
+    table_name: str,
+    ids: List[str],
+    key_name: str = "asin",
+    cache: Optional[TTLCache] = ITEM_CACHE,
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Look up full item records for `ids`, preserving their order
+
+    IDs are served from `cache` where possible, and only the remainder read from DynamoDB. Pass
+    `cache=None` to always read through.
+
+    Returns
+    -------
+    items :
+        Item records in the same order as `ids` (skipping any that were not found)
+    missing :
+        IDs from `ids` that could not be found in DynamoDB
+    """
+    found = {}
+    to_fetch = []
+    if cache is None:
+        to_fetch = ids
+    else:
+        cache.reset_stats()
+        for id in dict.fromkeys(ids):
+            item = cache.get(id)
+            if item is None:
+                to_fetch.append(id)
+            elif item is not NEGATIVE:
+                found[id] = item
+
+    if to_fetch:
+        fetched, unprocessed = batch_get_items(dynamodb, table_name, to_fetch, key_name=key_name)
+        found.update(fetched)
+        if cache is not None:
+            unprocessed = set(unprocessed)
+            for id in to_fetch:
+                if id in fetched:
+                    cache.put(id, fetched[id])
+                elif id not in unprocessed:
+                    cache.put(id, NEGATIVE)
+
+    if cache is not None:
+        logger.info(f"Item cache: {cache.stats()}")
+
+    items = []
+    missing = []
+    for id in ids:
+        item = found.get(id)
+        if item is None:
+            missing.append(id)
+        else:
+            # Copy so callers can annotate results without modifying cached or repeated records:
+            items.append(dict(item))
+    return items, missing
@@ -0,0 +1,147 @@
+"""Item search, shared by the Search and SearchRerank Lambdas
+
+Searches Elasticsearch by default, which requires ESENDPOINT (the domain endpoint, without https://) and
+REGION environment variables. The bundled local title index (see titleindex) can be used instead with
+SEARCH_ENGINE=local, and is used as a fallback when ES fails unless SEARCH_LOCAL_FALLBACK=false.
+TITLE_INDEX_PATH overrides the location of the local index file.
+"""
+
+# Python Built-Ins:
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+# Local Dependencies:
+from .esclient import SignedESClient
+from .searchcache import SEARCH_CACHE, SearchResultCache, normalize_query
+from . import titleindex
+
+DEFAULT_SIZE = 25
+# Item fields stored in the index that clients need, returned in slim documents:
+DOC_FIELDS = titleindex.DOC_FIELDS
+# Strip the ES response down to just the hit sources:
+FILTER_PATH = "hits.hits._source"
+
+SEARCH_ENGINE = os.environ.get("SEARCH_ENGINE", "es").lower()
+SEARCH_LOCAL_FALLBACK = os.environ.get("SEARCH_LOCAL_FALLBACK", "true").lower() == "true"
+TITLE_INDEX_PATH = os.environ.get(
+    "TITLE_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "title_index.json.gz"),
+)
+
+logger = logging.getLogger()
+
+_client = None
+
+
+def get_client() -> SignedESClient:
+    """Create the ES client on first use, so importing this module doesn't need ES config"""
+    global _client
+    if _client is None:
+        _client = SignedESClient(os.environ["ESENDPOINT"], os.environ["REGION"])
+    return _client
+
+
+def build_query(q: str, size: int=DEFAULT_SIZE, fields: List[str]=DOC_FIELDS) -> Dict[str, Any]:
+    """Build the ES query DSL for a (fuzzy) title search, returning only `fields` of each hit"""
+    # Alternatively, for exact matches across multiple fields:
+    # query = {
+    #     "size": size,
+    #     "query": {
+    #         "multi_match": {
+    #             "query": q,
+    #             "fields": ["asin", "title"],
+    #         },
+    #     },
+    # }
+    return {
+        "size": size,
+        "_source": { "includes": fields },
+        "query": {
+            "fuzzy": {
+                "title": {
+                    "value": q,
+                    "fuzziness": "AUTO",
+                    "max_expansions": 50,
+                    "prefix_length": 0,
+                    "transpositions": True,
+                    "rewrite": "constant_score",
+                },
+            },
+        },
+    }
+
+
+def search_local(q: str, size: int=DEFAULT_SIZE) -> List[Dict[str, Any]]:
+    """Search the bundled (in-process) title index"""
+    return titleindex.get_index(TITLE_INDEX_PATH).search(q, size=size)
+
+
+def search_documents(
+    q: str,
+    size: int=DEFAULT_SIZE,
+    cache: Optional[SearchResultCache]=SEARCH_CACHE,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """Search items by title, via the search result cache unless `cache=None`
+
+    The query text is normalized (case-folded, whitespace collapsed) before searching, so that equivalent
+    queries can share cache entries. Results from the local title index (whether configured as the
+    primary engine or used as fallback) are not cached.
+
+    Returns
+    -------
+    status_code :
+        HTTP status code of the Elasticsearch response (200 for cache hits and local results)
+    result :
+        Slim matching item documents (with only DOC_FIELDS), in ES score order
+    """
+    q = normalize_query(q)
+    if SEARCH_ENGINE == "local":
+        return 200, search_local(q, size=size)
+
+    if cache is not None:
+        key = cache.make_key(q, size=size, fields=DOC_FIELDS)
+        result = cache.get(key)
+        if result is not None:
+            # (Copy, so callers can annotate the documents without modifying the cache)
+            return 200, [dict(doc) for doc in result]
+
+    query = build_query(q, size=size)
+
+    # ES 6.x requires an explicit Content-Type header
+    headers = { "Content-Type": "application/json" }
+
+    try:
+        r = get_client().get(
+            "/_search",
+            params={ "filter_path": FILTER_PATH },
+            headers=headers,
+            data=json.dumps(query),
+        )
+    except Exception as err:
+        if not SEARCH_LOCAL_FALLBACK:
+            raise
+        logger.error(f"Search failed, falling back to local title index: {err}")
+        return 200, search_local(q, size=size)
+    if r.status_code != 200:
+        logger.error(f"Search failed with status {r.status_code}: {r.text[:1000]}")
+        if SEARCH_LOCAL_FALLBACK:
+            return 200, search_local(q, size=size)
+        return r.status_code, []
+
+    # (filter_path omits "hits" entirely when there are no matches)
+    result = [hit["_source"] for hit in r.json().get("hits", {}).get("hits", [])]
+    if cache is not None:
+        cache.put(key, [dict(doc) for doc in result])
+    return r.status_code, result
+
+
+def search_items(
+    q: str,
+    size: int=DEFAULT_SIZE,
+    cache: Optional[SearchResultCache]=SEARCH_CACHE,
+) -> Tuple[int, List[str]]:
+    """Search items by title, like search_documents() but returning just the item IDs (ASINs)"""
+    status_code, docs = search_documents(q, size=size, cache=cache)
+    return status_code, [doc["asin"] for doc in docs]
@@ -0,0 +1,151 @@
+"""Search result (list) cache: per-container LRU, optionally shared across containers via DynamoDB
+
+Results are keyed on the normalized query text plus query parameters. When SEARCH_CACHE_TABLE_NAME is set,
+results are also written to (and read from) that DynamoDB table, whose `expires` attribute should be
+configured as the table's TTL attribute.
+
+Since indexing a new item can change the results of *any* query (not just those already listing it),
+invalidation works by generation: Writers to the index (UpdateSearchCluster) call invalidate_items(),
+which bumps a generation counter stored in the shared table. Shared entries are keyed by generation, and
+readers poll the counter at most every SEARCH_CACHE_GENERATION_CHECK_SECS, dropping their local entries
+when it changes. Without a shared table, staleness is bounded by SEARCH_CACHE_TTL_SECS alone.
+
+Environment variables:
+
+- SEARCH_CACHE_TABLE_NAME (optional, default unset: local cache only)
+- SEARCH_CACHE_MAX_ENTRIES (default 1000, 0 disables the local cache)
+- SEARCH_CACHE_TTL_SECS (default 300)
+- SEARCH_CACHE_GENERATION_CHECK_SECS (default 10)
+"""
+
+# Python Built-Ins:
+import json
+import logging
+import os
+import time
+from typing import Any, Iterable, List, Optional
+
+# External Dependencies:
+import boto3
+
+# Local Dependencies:
+from .cache import TTLCache
+
+logger = logging.getLogger()
+
+GENERATION_KEY = "#generation"
+
+
+def normalize_query(q: str) -> str:
+    """Normalize search text (case and whitespace) so equivalent queries share a cache entry"""
+    return " ".join(q.casefold().split())
+
+
+class SearchResultCache:
+    """Two-level (local + optional shared DynamoDB) cache of search result lists
+
+    Parameters
+    ----------
+    table_name : Optional
+        DynamoDB table (string hash key `key`) to share results between containers
+    max_entries :
+        Maximum number of locally cached queries
+    ttl_secs :
+        Lifetime of cached results, both locally and in the shared table
+    generation_check_secs :
+        Minimum interval between reads of the shared invalidation generation
+    """
+    def __init__(
+        self,
+        table_name: Optional[str]=None,
+        max_entries: int=1000,
+        ttl_secs: float=300,
+        generation_check_secs: float=10,
+    ):
+        self.local = TTLCache(max_entries=max_entries, ttl_secs=ttl_secs)
+        self.ttl_secs = ttl_secs
+        self.generation_check_secs = generation_check_secs
+        self.table = boto3.resource("dynamodb").Table(table_name) if table_name else None
+        self._generation = 0
+        self._generation_checked_at = float("-inf")
+
+    @staticmethod
+    def make_key(q: str, **params: Any) -> str:
+        return json.dumps([normalize_query(q), params], sort_keys=True)
+
+    def _current_generation(self) -> int:
+        """(Periodically re-)read the shared generation, dropping local entries if it's moved on"""
+        if self.table is None:
+            return self._generation
+        now = time.monotonic()
+        if now - self._generation_checked_at >= self.generation_check_secs:
+            self._generation_checked_at = now
+            try:
+                item = self.table.get_item(Key={ "key": GENERATION_KEY }).get("Item")
+                generation = int(item["generation"]) if item else 0
+            except Exception as err:
+                logger.warning(f"Couldn't read search cache generation: {err}")
+                return self._generation
+            if generation != self._generation:
+                self.local.clear()
+                self._generation = generation
+        return self._generation
+
+    def get(self, key: str) -> Optional[List[Any]]:
+        """Return cached results for `key`, or None if not cached"""
+        generation = self._current_generation()
+        result = self.local.get(key)
+        if result is not None:
+            return list(result)
+        elif self.table is None:
+            return None
+        try:
+            item = self.table.get_item(Key={ "key": f"{generation}|{key}" }).get("Item")
+        except Exception as err:
+            logger.warning(f"Couldn't read shared search cache: {err}")
+            return None
+        # (DynamoDB TTL deletion is lazy, so check expiry ourselves too)
+        if item is None or int(item["expires"]) <= time.time():
+            return None
+        result = list(item["result"])
+        self.local.put(key, result)
+        return result
+
+    def put(self, key: str, result: List[Any]) -> None:
+        generation = self._current_generation()
+        self.local.put(key, result)
+        if self.table is not None:
+            try:
+                self.table.put_item(Item={
+                    "key": f"{generation}|{key}",
+                    "result": result,
+                    "expires": int(time.time() + self.ttl_secs),
+                })
+            except Exception as err:
+                logger.warning(f"Couldn't write shared search cache: {err}")
+
+    def invalidate_items(self, asins: Iterable[str]) -> None:
+        """Invalidate cached results after `asins` were (re-)indexed or removed from the search index"""
+        asins = list(asins)
+        if not asins:
+            return
+        self.local.clear()
+        if self.table is not None:
+            try:
+                result = self.table.update_item(
+                    Key={ "key": GENERATION_KEY },
+                    UpdateExpression="ADD generation :one",
+                    ExpressionAttributeValues={ ":one": 1 },
+                    ReturnValues="UPDATED_NEW",
+                )
+                self._generation = int(result["Attributes"]["generation"])
+            except Exception as err:
+                logger.warning(f"Couldn't invalidate shared search cache for {len(asins)} items: {err}")
+
+
+SEARCH_CACHE = SearchResultCache(
+    table_name=os.environ.get("SEARCH_CACHE_TABLE_NAME"),
+    max_entries=int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 1000)),
+    ttl_secs=float(os.environ.get("SEARCH_CACHE_TTL_SECS", 300)),
+    generation_check_secs=float(os.environ.get("SEARCH_CACHE_GENERATION_CHECK_SECS", 10)),
+)
@@ -0,0 +1,193 @@
+"""In-process fuzzy item title index, as a local search engine or fallback for Elasticsearch
+
+Approximates the Search Lambda's ES `fuzzy` title query: Titles are tokenized roughly like the ES standard
+analyzer, and a document matches a query token if one of its title terms is within the ES "AUTO"
+fuzziness (0 edits for terms of 1-2 characters, 1 for 3-5, 2 otherwise, counting adjacent transpositions
+as one edit) of it. Candidate terms are found through a padded-trigram index over the term vocabulary and
+then verified by exact edit distance, keeping the MAX_EXPANSIONS closest per query token.
+
+Unlike the (constant-score) ES query, multi-word queries are matched token by token, and results ranked
+by total match closeness (then catalog order).
+
+The index serializes to a small gzipped JSON file (documents, term vocabulary and postings), which is
+bundled with the layer - see functions/layers/build_title_index.py.
+"""
+
+# Python Built-Ins:
+from collections import defaultdict
+import gzip
+import json
+import re
+from typing import Any, Dict, Iterable, List, Tuple
+
+DOC_FIELDS = ["asin", "title", "imUrl"]
+MAX_EXPANSIONS = 50
+FORMAT_VERSION = 1
+
+token_exp = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return token_exp.findall(text.casefold())
+
+
+def auto_fuzziness(term: str) -> int:
+    """Maximum edit distance for a term under ES "AUTO" fuzziness"""
+    n = len(term)
+    return 0 if n <= 2 else 1 if n <= 5 else 2
+
+
+def trigrams(term: str) -> List[str]:
+    padded = f"$${term}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def edit_distance(a: str, b: str, max_dist: int) -> int:
+    """Optimal string alignment (Damerau-Levenshtein with adjacent transpositions) distance
+
+    Returns max_dist + 1 as soon as the distance is known to exceed max_dist.
+    """
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > max_dist:
+            return max_dist + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class TitleIndex:
+    """Fuzzy term index over item titles
+
+    Parameters
+    ----------
+    docs :
+        Item documents (dicts with DOC_FIELDS), in catalog order
+    terms :
+        Vocabulary of title terms
+    postings :
+        For each term in `terms`, the sorted indices of `docs` whose title contains it
+    """
+    def __init__(self, docs: List[Dict[str, Any]], terms: List[str], postings: List[List[int]]):
+        self.docs = docs
+        self.terms = terms
+        self.postings = postings
+        self.term_ids = { term: i for i, term in enumerate(terms) }
+        self.trigram_terms = defaultdict(list)
+        for term_id, term in enumerate(terms):
+            for gram in set(trigrams(term)):
+                self.trigram_terms[gram].append(term_id)
+
+    @classmethod
+    def build(cls, items: Iterable[Dict[str, Any]]) -> "TitleIndex":
+        """Build an index from item documents (later duplicates of an asin replace earlier ones)"""
+        docs_by_id = {}
+        for item in items:
+            docs_by_id[item["asin"]] = { field: item[field] for field in DOC_FIELDS if field in item }
+        docs = list(docs_by_id.values())
+        term_docs = defaultdict(list)
+        for ix, doc in enumerate(docs):
+            for term in dict.fromkeys(tokenize(doc.get("title", ""))):
+                term_docs[term].append(ix)
+        terms = sorted(term_docs)
+        return cls(docs, terms, [term_docs[term] for term in terms])
+
+    def save(self, path: str) -> None:
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": FORMAT_VERSION,
+                    "fields": DOC_FIELDS,
+                    "docs": [[doc.get(field) for field in DOC_FIELDS] for doc in self.docs],
+                    "terms": self.terms,
+                    # Delta-encode the (sorted) postings, which compresses much better:
+                    "postings": [
+                        [ids[0]] + [ids[i] - ids[i - 1] for i in range(1, len(ids))]
+                        for ids in self.postings
+                    ],
+                },
+                f,
+                separators=(",", ":"),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "TitleIndex":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported title index version {data['version']} in {path}")
+        postings = []
+        for deltas in data["postings"]:
+            ids = []
+            total = 0
+            for delta in deltas:
+                total += delta
+                ids.append(total)
+            postings.append(ids)
+        docs = [
+            { field: value for field, value in zip(data["fields"], values) if value is not None }
+            for values in data["docs"]
+        ]
+        return cls(docs, data["terms"], postings)
+
+    def expand(self, token: str) -> List[Tuple[int, int]]:
+        """Find (term_id, edit distance) of up to MAX_EXPANSIONS vocabulary terms fuzzily matching token"""
+        max_dist = auto_fuzziness(token)
+        if max_dist == 0:
+            term_id = self.term_ids.get(token)
+            return [] if term_id is None else [(term_id, 0)]
+
+        # Each edit destroys at most 3 (or 4, for a transposition) of the token's padded trigrams, so a
+        # matching term must share at least this many:
+        grams = set(trigrams(token))
+        min_shared = max(1, len(grams) - 4 * max_dist)
+        shared = defaultdict(int)
+        for gram in grams:
+            for term_id in self.trigram_terms.get(gram, ()):
+                shared[term_id] += 1
+
+        matches = []
+        for term_id, n_shared in shared.items():
+            if n_shared >= min_shared:
+                dist = edit_distance(token, self.terms[term_id], max_dist)
+                if dist <= max_dist:
+                    matches.append((dist, self.terms[term_id], term_id))
+        matches.sort()
+        return [(term_id, dist) for dist, _, term_id in matches[:MAX_EXPANSIONS]]
+
+    def search(self, q: str, size: int=25) -> List[Dict[str, Any]]:
+        """Return up to `size` documents matching query text `q`, best first"""
+        scores = defaultdict(int)
+        for token in dict.fromkeys(tokenize(q)):
+            # Score each doc by its closest matching term for this token:
+            best = {}
+            for term_id, dist in self.expand(token):
+                token_score = 3 - dist
+                for ix in self.postings[term_id]:
+                    if best.get(ix, 0) < token_score:
+                        best[ix] = token_score
+            for ix, token_score in best.items():
+                scores[ix] += token_score
+        ranked = sorted(scores, key=lambda ix: (-scores[ix], ix))[:size]
+        return [dict(self.docs[ix]) for ix in ranked]
+
+
+_index = None
+_index_path = None
+
+
+def get_index(path: str) -> TitleIndex:
+    """Load (once per container) and return the index at `path`"""
+    global _index, _index_path
+    if _index is None or _index_path != path:
+        _index = TitleIndex.load(path)
+        _index_path = path
+    return _index
@@ -0,0 +1,65 @@
+"""Build the fuzzy title index bundled with the ItemStoreCommon layer, from an item catalog file
+
+Usage (from the repository root):
+
+    python functions/layers/build_title_index.py [--items data/items.json]
+
+Items are read with the notebooks' Personalize/util/dataformat.datafile_reader, so any (gzipped) JSON-lines
+or CSV catalog it supports can be used.
+"""
+
+# Python Built-Ins:
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LAYER_DIR = os.path.join(ROOT, "functions", "layers", "ItemStoreCommon")
+DEFAULT_OUTPUT = os.path.join(LAYER_DIR, "itemstore", "data", "title_index.json.gz")
+
+
+def import_dataformat():
+    """Import Personalize/util/dataformat *without* running util/__init__.py
+
+    (The package __init__ pulls in the notebook-only dependencies e.g. pandas, matplotlib, boto3 clients)
+    """
+    util_dir = os.path.join(ROOT, "Personalize", "util")
+    spec = importlib.util.spec_from_file_location(
+        "util",
+        os.path.join(util_dir, "__init__.py"),
+        submodule_search_locations=[util_dir],
+    )
+    sys.modules.setdefault("util", importlib.util.module_from_spec(spec))
+    from util import dataformat
+    return dataformat
+
+
+def build(items_path, output_path):
+    sys.path.insert(0, LAYER_DIR)
+    from itemstore.titleindex import TitleIndex
+
+    dataformat = import_dataformat()
+    t0 = time.time()
+    # ITEM_FIELDS are (ITEM_ID, TITLE, IMGURL):
+    extract, items = dataformat.detect_extractor(dataformat.datafile_reader(items_path), dataformat.ITEM_FIELDS)
+    index = TitleIndex.build(dict(zip(("asin", "title", "imUrl"), extract(item))) for item in items)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    index.save(output_path)
+    print("Indexed {} items ({} terms) in {:.1f}s -> {} ({:.0f}KB)".format(
+        len(index.docs),
+        len(index.terms),
+        time.time() - t0,
+        output_path,
+        os.path.getsize(output_path) / 1024,
+    ))
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", default=os.path.join(ROOT, "data", "items.json"))
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+    build(args.items, args.output)
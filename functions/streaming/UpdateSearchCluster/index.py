@@ -1,36 +1,101 @@
-import boto3
+import json as stdjson
 import os
-import requests
 from dynamodb_json import json_util as json
-from requests_aws4auth import AWS4Auth
 
-region = os.environ["REGION"]
-service = "es"
-credentials = boto3.Session().get_credentials()
-awsauth = AWS4Auth(credentials.access_key, credentials.secret_key, region, service, session_token=credentials.token)
+# Local Dependencies (ItemStoreCommon layer):
+from itemstore.esclient import SignedESClient
+from itemstore.searchcache import SEARCH_CACHE
 
-host = "https://" + os.environ["ESENDPOINT"] # the Amazon ElaticSearch domain, with https://
 index = "items_vanilla"
 type = "items"
 
-url = host + "/" + index + "/" + type + "/"
+headers = { "Content-Type": "application/x-ndjson" }
+
+# Cap each _bulk request body (ES recommends roughly 5-15MB per request):
+MAX_BULK_BYTES = int(os.environ.get("MAX_BULK_BYTES", 5 * 1024 * 1024))
+TIMEOUT = (3.05, 30)  # (connect, read) seconds
+
+# Keep-alive signed client, reused across records and warm invocations (and re-signing with refreshed
+# credentials when the role's credentials rotate):
+client = SignedESClient(
+    os.environ["ESENDPOINT"], # the Amazon ElasticSearch domain, without https://
+    os.environ["REGION"],
+    pool_maxsize=4,
+    timeout=TIMEOUT,
+)
+
+
+def bulk_lines(record):
+    """Convert a DynamoDB stream record to its (1 or 2) _bulk NDJSON lines"""
+    # Get the primary key for use as the Elasticsearch ID
+    id = record["dynamodb"]["Keys"]["asin"]["S"]
+    action = { "_index": index, "_type": type, "_id": id }
+    if record["eventName"] == "REMOVE":
+        return stdjson.dumps({ "delete": action }) + "\n"
+    else:
+        document = json.loads(record["dynamodb"]["NewImage"])
+        return stdjson.dumps({ "index": action }) + "\n" + stdjson.dumps(document, default=str) + "\n"
+
+
+def bulk_batches(records):
+    """Split records into (body, records) batches of no more than MAX_BULK_BYTES each
+
+    (A single record bigger than the cap is still sent, alone)
+    """
+    body = []
+    batch = []
+    size = 0
+    for record in records:
+        lines = bulk_lines(record).encode("utf-8")
+        if batch and size + len(lines) > MAX_BULK_BYTES:
+            yield b"".join(body), batch
+            body = []
+            batch = []
+            size = 0
+        body.append(lines)
+        batch.append(record)
+        size += len(lines)
+    if batch:
+        yield b"".join(body), batch
+
+
+def send_bulk(body, batch):
+    """Send one _bulk request, returning the subset of `batch` records that failed"""
+    try:
+        r = client.post("/_bulk", data=body, headers=headers)
+        r.raise_for_status()
+        result = r.json()
+    except Exception as err:
+        print(f"_bulk request of {len(batch)} records failed: {err}")
+        return batch
+
+    if not result.get("errors"):
+        return []
+    failed = []
+    # Bulk response items are in the same order as the request actions:
+    for record, item in zip(batch, result["items"]):
+        (op, status), = item.items()
+        # Deleting a document that was never indexed is fine:
+        if status.get("error") and not (op == "delete" and status.get("status") == 404):
+            print(f"Failed to {op} {status.get('_id')}: {status['error']}")
+            failed.append(record)
+    return failed
 
-headers = { "Content-Type": "application/json" }
 
 # UpdateSearchCluster - Updates Elasticsearch when new books are added to the store
 def handler(event, context):
-    count = 0
-    print(event)
-    for record in event["Records"]:
-        # Get the primary key for use as the Elasticsearch ID
-        id = record["dynamodb"]["Keys"]["asin"]["S"]
-
-        if record['eventName'] == 'REMOVE':
-            r = requests.delete(url + id, auth=awsauth)
-        else:
-            document = json.loads(record['dynamodb']['NewImage'])
-            print(document)
-            r = requests.put(url + id, auth=awsauth, json=document, headers=headers)
-        count += 1
-
-    return str(count) + " records processed."
\ No newline at end of file
+    failed = []
+    for body, batch in bulk_batches(event["Records"]):
+        failed += send_bulk(body, batch)
+
+    print(f"{len(event['Records'])} records processed, {len(failed)} failed.")
+    failed_seqs = set(record["dynamodb"]["SequenceNumber"] for record in failed)
+    # Search results may have changed, so invalidate cached queries:
+    SEARCH_CACHE.invalidate_items(
+        record["dynamodb"]["Keys"]["asin"]["S"] for record in event["Records"]
+        if record["dynamodb"]["SequenceNumber"] not in failed_seqs
+    )
+    # Report only the failed records for retry (requires ReportBatchItemFailures on the event source):
+    return {
+        "batchItemFailures": [{ "itemIdentifier": seq } for seq in failed_seqs],
+    }